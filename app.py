@@ -1,68 +1,283 @@
-from flask import Flask, request, jsonify
-import subprocess
-import os
 import json
-import sys
+import math
 
-app = Flask(__name__)
-python_path = sys.executable
-@app.route("/transcript", methods=["GET"])
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, url_for
+
+import engines
+import formats
+import metrics
+import whisper_server
+from jobs import QueueFull
+from service import TranscriptService, WhisperBusy, default_config
+
+bp = Blueprint("transcripts", __name__)
+
+# Largest number of URLs accepted by POST /transcripts/batch
+MAX_BATCH_SIZE = 500
+
+# Upper bound for GET /transcripts/<id>?wait=N long-polls
+MAX_WAIT_SECONDS = 60
+
+def create_app(config=None):
+    """Build the Flask app and the warm state its request threads share."""
+    app = Flask(__name__)
+    app.config.from_mapping(default_config())
+    if config:
+        app.config.update(config)
+
+    app.extensions["transcripts"] = TranscriptService(app.config)
+    app.register_blueprint(bp)
+    return app
+
+def service():
+    return current_app.extensions["transcripts"]
+
+def error_response(message, retry_after=None):
+    error_message = message.lower()
+
+    if retry_after is not None:
+        return jsonify({"error": message}), 429, {"Retry-After": str(retry_after)}
+    elif "timed out" in error_message or "deadline exceeded" in error_message:
+        return jsonify({"error": message}), 504
+    elif "yt-dlp failed" in error_message:
+        return jsonify({"error": "Invalid URL or video not accessible"}), 400
+    elif "subtitles not found" in error_message:
+        return jsonify({"error": "No subtitles available for this video"}), 404
+    elif "failed to clean vtt" in error_message:
+        return jsonify({"error": "Transcript formatting failed"}), 500
+    else:
+        return jsonify({"error": message or "Unknown error occurred"}), 500
+
+def request_timeout():
+    """The ``timeout`` query parameter, in seconds, or None for no deadline."""
+    timeout = request.args.get("timeout", type=float)
+    return timeout if timeout and timeout > 0 else None
+
+def request_payload():
+    """The posted JSON object, ``{}`` without one; raises ``ValueError`` for other JSON."""
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return {}
+    if not isinstance(payload, dict):
+        raise ValueError("Request body must be a JSON object")
+    return payload
+
+def parse_timeout(value):
+    """Seconds from a posted ``timeout``, or None for no deadline; raises ``ValueError`` if invalid."""
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        timeout = math.nan
+    if isinstance(value, bool) or math.isnan(timeout):
+        raise ValueError("timeout must be a number of seconds")
+    return timeout if 0 < timeout < math.inf else None
+
+def parse_time(value):
+    """Seconds from ``"6120"``, ``"102:00"`` or ``"1:42:00"``."""
+    seconds = 0.0
+    for part in str(value).split(":"):
+        seconds = seconds * 60 + float(part)
+    # float() also reads "nan" and "inf", which no recording has
+    if not math.isfinite(seconds) or seconds < 0:
+        raise ValueError
+    return seconds
+
+def request_options(params):
+    """Per-request pipeline settings from ``params``; raises ``ValueError`` if invalid."""
+    options = {name: params[name] for name in ("engine", "compute_type") if params.get(name)}
+    for name, value in options.items():
+        if not isinstance(value, str):
+            raise ValueError(f"{name} must be a string")
+    for name in ("start", "end"):
+        if params.get(name) not in (None, ""):
+            try:
+                options[name] = parse_time(params[name])
+            except ValueError:
+                raise ValueError(f"{name} must be seconds or H:MM:SS") from None
+    if options.get("start") is not None and options.get("end") is not None and options["end"] <= options["start"]:
+        raise ValueError("end must be after start")
+    if params.get("words") in (True, "1", "true", "yes"):
+        options["words"] = True
+    if params.get("quality"):
+        if params["quality"] not in whisper_server.QUALITIES:
+            raise ValueError(f"quality must be one of {', '.join(whisper_server.QUALITIES)}")
+        options["quality"] = params["quality"]
+    if "engine" in options or "compute_type" in options:
+        engines.resolve(options.get("engine"), options.get("compute_type"))
+    return options
+
+def request_format(params):
+    """The ``format`` parameter: ``json`` (the default) or one of ``formats.FORMATS``."""
+    fmt = params.get("format") or "json"
+    if fmt != "json" and fmt not in formats.FORMATS:
+        raise ValueError(f"format must be one of json, {', '.join(formats.FORMATS)}")
+    return fmt
+
+def formatted_response(result, fmt):
+    """A finished ``result`` as the JSON body, or rendered in ``fmt``."""
+    if fmt == "json":
+        body = dict(result)
+        body.setdefault("method", "unknown")
+        return jsonify(body), 200
+    try:
+        body, content_type = formats.render(result, fmt)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 422
+    return Response(body, content_type=content_type)
+
+def stream_response(url, mode, options):
+    events = service().iter_events(url, request_timeout(), options)
+
+    if mode == "sse":
+        def body():
+            for event in events:
+                name = "segment" if "segment" in event else ("error" if "error" in event else "done")
+                yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+        mimetype = "text/event-stream"
+    else:
+        def body():
+            for event in events:
+                yield json.dumps(event) + "\n"
+        mimetype = "application/x-ndjson"
+
+    return Response(body(), mimetype=mimetype, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@bp.route("/transcript", methods=["GET"])
 def get_transcript():
     url = request.args.get("url")
     if not url:
         return jsonify({"error": "Missing URL"}), 400
 
     try:
-        script_path = os.path.join(os.path.dirname(__file__), "transcript.py")
+        options = request_options(request.args)
+        fmt = request_format(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        process = subprocess.Popen(
-            [python_path, script_path, url.strip()],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-        )
-        output, _ = process.communicate()
-        result = output.decode("utf-8")
+    stream = request.args.get("stream")
+    if stream in ("ndjson", "sse", "1", "true"):
+        return stream_response(url.strip(), stream, options)
 
-        if process.returncode != 0 or "\"error\"" in result:
-            try:
-                error_data = json.loads(result)
-                error_message = error_data.get("error", "").lower()
-
-                if "yt-dlp failed" in error_message:
-                    return jsonify({"error": "Invalid URL or video not accessible"}), 400
-                elif "subtitles not found" in error_message:
-                    return jsonify({"error": "No subtitles available for this video"}), 404
-                elif "failed to clean vtt" in error_message:
-                    return jsonify({"error": "Transcript formatting failed"}), 500
-                else:
-                    return jsonify({"error": error_data.get("error", "Unknown error occurred")}), 500
-
-            except json.JSONDecodeError:
-                return jsonify({"error": "Transcript failed", "details": result}), 500
-
-        try:
-            parsed = json.loads(result)
-            # If Whisper or YouTubeTranscriptApi returned result
-            if isinstance(parsed, dict) and "transcript" in parsed:
-                return jsonify({
-                    "method": parsed.get("method", "unknown"),
-                    "transcript": parsed["transcript"]
-                }), 200
-
-            # If yt-dlp with .vtt file worked
-            elif isinstance(parsed, str):
-                return jsonify({
-                    "method": "yt-dlp subtitles",
-                    "transcript": parsed
-                }), 200
-
-        except json.JSONDecodeError:
-                # If not JSON, return as plain text
-            return result, 200, {"Content-Type": "text/plain"}
+    try:
+        result = service().fetch_transcript(url, request_timeout(), wait_for_whisper=False, options=options)
+
+        if "error" in result:
+            return error_response(result["error"], result.get("retry_after"))
 
+        return formatted_response(result, fmt)
+
+    except WhisperBusy:
+        return defer_to_whisper_queue(url.strip(), options)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def defer_to_whisper_queue(url, options=None):
+    """No captions and Whisper is saturated: queue a job instead of blocking."""
+    try:
+        job = service().queue_whisper(url, request_timeout(), options)
+    except QueueFull as e:
+        return error_response(str(e), e.retry_after)
+
+    body = job_response(job)
+    headers = {
+        "Location": url_for(".get_transcript_job", job_id=job["id"]),
+        "Retry-After": str(service().whisper_gate.retry_after(body.get("queue_position"))),
+    }
+    return jsonify(body), 202, headers
+
+def job_response(job):
+    body = {"id": job["id"], "url": job["url"], "status": job["status"]}
+    position = service().whisper_gate.position(job["id"])
+    if position is not None:
+        body["queue_position"] = position
+    if job["status"] == "done":
+        body["method"] = "unknown"
+        body.update(job["result"])
+    elif job["status"] == "failed":
+        body["error"] = job["result"]["error"]
+    return body
+
+@bp.route("/transcripts", methods=["POST"])
+def create_transcript_job():
+    try:
+        payload = request_payload()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    url = payload.get("url") or request.form.get("url") or request.args.get("url")
+    if not url:
+        return jsonify({"error": "Missing URL"}), 400
+    if not isinstance(url, str):
+        return jsonify({"error": "url must be a string"}), 400
+
+    try:
+        options = request_options({**request.args.to_dict(), **payload})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        timeout = request_timeout() if payload.get("timeout") in (None, "") else parse_timeout(payload["timeout"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        job = service().jobs.submit(url.strip(), timeout, options=options)
+    except QueueFull as e:
+        return error_response(str(e), e.retry_after)
+    location = url_for(".get_transcript_job", job_id=job["id"])
+    return jsonify(job_response(job)), 202, {"Location": location}
+
+@bp.route("/transcripts/<job_id>", methods=["GET"])
+def get_transcript_job(job_id):
+    try:
+        fmt = request_format(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    wait = request.args.get("wait", type=float)
+    if wait:
+        job = service().jobs.wait(job_id, min(wait, MAX_WAIT_SECONDS))
+    else:
+        job = service().jobs.get(job_id)
+
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if fmt != "json" and job["status"] == "done":
+        return formatted_response(job["result"], fmt)
+
+    body = job_response(job)
+    if "queue_position" in body:
+        return jsonify(body), 200, {"Retry-After": str(service().whisper_gate.retry_after(body["queue_position"]))}
+    return jsonify(body), 200
+
+@bp.route("/transcripts/batch", methods=["POST"])
+def create_transcript_batch():
+    try:
+        payload = request_payload()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    urls = payload.get("urls", [])
+    if not isinstance(urls, list):
+        return jsonify({"error": "urls must be a list of URLs"}), 400
+    urls = [u.strip() for u in urls if isinstance(u, str) and u.strip()]
+    if not urls:
+        return jsonify({"error": "Missing URLs"}), 400
+    if len(urls) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} URLs per batch"}), 400
+
+    batches = service().batches
+
+    def body():
+        for url, result in batches.run(urls):
+            item = {"url": url}
+            item.update(result)
+            yield json.dumps(item) + "\n"
+
+    return Response(body(), mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+@bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    create_app().run(debug=True, port=5000)
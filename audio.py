@@ -0,0 +1,228 @@
+"""Audio helpers for the Whisper path: decoding and silence-aware chunking."""
+import os
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+# Energy is measured over 30 ms frames, the usual VAD frame size
+FRAME_SECONDS = 0.03
+
+# Voice-activity pre-pass. A frame is speech when it is louder than this
+# fraction of the way from the recording's noise floor (5th percentile) to
+# its loud level (95th percentile).
+VAD_THRESHOLD = 0.3
+# Recordings whose floor and loud level are closer than this are treated as
+# uniform: all speech, or all silence when quieter than SILENCE_DB
+VAD_MIN_RANGE_DB = 10
+SILENCE_DB = -60
+# Pauses shorter than this stay in, so sentences are not cut apart
+VAD_MIN_SILENCE_SECONDS = 2.0
+# Kept around every speech region so word onsets and tails survive
+VAD_PAD_SECONDS = 0.5
+# Isolated blips shorter than this (a door, a cough) are dropped
+VAD_MIN_SPEECH_SECONDS = 0.25
+
+
+def load_audio(path, sample_rate=SAMPLE_RATE):
+    """Decode any ffmpeg-readable file to mono float32 PCM in [-1, 1]."""
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate),
+        "-",
+    ]
+    out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def _kill(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def stream_pcm(url, sample_rate=SAMPLE_RATE, timeout=None, should_stop=None, block_size=1 << 20,
+               start=None, end=None):
+    """Download ``url``'s best audio and decode it to mono float32 PCM in one pass.
+
+    yt-dlp writes the original stream (opus, m4a, ...) to a pipe that ffmpeg
+    decodes straight to 16 kHz samples, so there is no lossy mp3 transcode,
+    no second decode and no temporary file. Both processes are killed once
+    ``timeout`` seconds pass (``subprocess.TimeoutExpired``) or
+    ``should_stop()`` returns true (``InterruptedError``).
+
+    ``start`` and ``end`` (seconds) limit the download to that section; the
+    samples then begin at ``start``.
+    """
+    args = ["yt-dlp", "--cookies", "youtube.com_cookies.txt", "-f", "bestaudio",
+            "--no-playlist", "--quiet", "-o", "-", url]
+    if start is not None or end is not None:
+        # Sections are cut by yt-dlp's ffmpeg downloader, which fetches only
+        # the byte ranges or HLS segments it needs. m4a can't be muxed to a
+        # pipe, so prefer webm/opus or HLS audio
+        section = f"*{start or 0}-{'inf' if end is None else end}"
+        args[4:5] = ["bestaudio[ext=webm]/bestaudio[protocol^=m3u8]/bestaudio", "--download-sections", section]
+    errors = tempfile.TemporaryFile()
+    ytdlp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=errors, start_new_session=True)
+    ffmpeg = subprocess.Popen(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+         "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "pipe:1"],
+        stdin=ytdlp.stdout, stdout=subprocess.PIPE, stderr=errors, start_new_session=True,
+    )
+    # ffmpeg owns the read end now; closing ours lets yt-dlp see SIGPIPE
+    ytdlp.stdout.close()
+
+    stopped = threading.Event()
+    reason = []
+
+    def watchdog():
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not stopped.wait(0.5):
+            if deadline is not None and time.monotonic() > deadline:
+                reason.append("timeout")
+            elif should_stop and should_stop():
+                reason.append("stopped")
+            else:
+                continue
+            _kill(ytdlp)
+            _kill(ffmpeg)
+            return
+
+    threading.Thread(target=watchdog, daemon=True).start()
+    pcm = bytearray()
+    try:
+        while True:
+            block = ffmpeg.stdout.read(block_size)
+            if not block:
+                break
+            pcm += block
+        ffmpeg.wait()
+        ytdlp.wait()
+    finally:
+        stopped.set()
+        _kill(ytdlp)
+        _kill(ffmpeg)
+        ffmpeg.stdout.close()
+
+    with errors:
+        if reason == ["timeout"]:
+            raise subprocess.TimeoutExpired("yt-dlp", timeout)
+        if reason:
+            raise InterruptedError("Audio download cancelled")
+        if ytdlp.returncode != 0 or ffmpeg.returncode != 0 or not pcm:
+            errors.seek(0)
+            detail = errors.read().decode("utf-8", "replace").strip()[-500:]
+            raise RuntimeError(f"yt-dlp audio extraction failed: {detail}")
+
+    usable = len(pcm) // 2 * 2
+    return np.frombuffer(pcm, np.int16, count=usable // 2).astype(np.float32) / 32768.0
+
+
+def frame_energy(audio, sample_rate=SAMPLE_RATE, frame_seconds=FRAME_SECONDS):
+    """RMS energy in dBFS of consecutive, non-overlapping frames."""
+    frame = int(sample_rate * frame_seconds)
+    usable = len(audio) // frame * frame
+    frames = audio[:usable].reshape(-1, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1) + 1e-12)
+    return 20 * np.log10(rms)
+
+
+def speech_regions(audio, sample_rate=SAMPLE_RATE, min_silence=VAD_MIN_SILENCE_SECONDS, pad=VAD_PAD_SECONDS):
+    """Find the parts of ``audio`` that contain speech.
+
+    Returns a sorted list of non-overlapping ``(start_sample, end_sample)``
+    pairs, empty when the whole recording is silent.
+    """
+    energy = frame_energy(audio, sample_rate)
+    if not len(energy):
+        return [(0, len(audio))] if len(audio) else []
+
+    floor, loud = np.percentile(energy, [5, 95])
+    if loud - floor < VAD_MIN_RANGE_DB:
+        return [(0, len(audio))] if loud > SILENCE_DB else []
+
+    voiced = energy > floor + (loud - floor) * VAD_THRESHOLD
+    # Rising and falling edges give the [start, end) frame runs of speech
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], voiced.astype(np.int8), [0]))))
+    gap = int(min_silence / FRAME_SECONDS)
+    padding = int(pad / FRAME_SECONDS)
+
+    runs = []
+    for start, end in zip(edges[0::2], edges[1::2]):
+        if runs and start - runs[-1][1] < gap:
+            runs[-1][1] = end
+        else:
+            runs.append([start, end])
+
+    frame = int(sample_rate * FRAME_SECONDS)
+    min_frames = int(VAD_MIN_SPEECH_SECONDS / FRAME_SECONDS)
+    regions = []
+    for start, end in runs:
+        if end - start < min_frames:
+            continue
+        start = int(max(0, start - padding) * frame)
+        end = len(audio) if end + padding >= len(energy) else int((end + padding) * frame)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+
+def keep_regions(audio, regions):
+    """Concatenate ``regions`` of ``audio``, dropping everything between them."""
+    if len(regions) == 1 and regions[0] == (0, len(audio)):
+        return audio
+    return np.concatenate([audio[start:end] for start, end in regions]) if regions else audio[:0]
+
+
+def original_time(seconds, regions, sample_rate=SAMPLE_RATE):
+    """Map a time in the ``keep_regions`` output back to the original recording."""
+    sample = seconds * sample_rate
+    kept = 0
+    for start, end in regions:
+        if sample < kept + end - start:
+            break
+        kept += end - start
+    else:
+        # Past the last region: clamp to its end
+        return regions[-1][1] / sample_rate if regions else seconds
+    return (start + sample - kept) / sample_rate
+
+
+def split_on_silence(audio, chunk_seconds, search_seconds=30, sample_rate=SAMPLE_RATE):
+    """Split ``audio`` into roughly ``chunk_seconds`` long pieces.
+
+    Each cut is placed at the quietest half second within ``search_seconds``
+    of the target position, so words are not sliced in half. Returns a list
+    of ``(start_sample, end_sample)`` pairs covering the whole signal.
+    """
+    total = len(audio)
+    chunk = int(chunk_seconds * sample_rate)
+    if total <= chunk * 1.5:
+        return [(0, total)]
+
+    energy = frame_energy(audio, sample_rate)
+    frame = int(sample_rate * FRAME_SECONDS)
+    # Smooth over ~0.5 s so a single quiet frame between words doesn't win
+    window = max(1, int(0.5 / FRAME_SECONDS))
+    smoothed = np.convolve(energy, np.ones(window) / window, mode="same")
+    search = int(search_seconds / FRAME_SECONDS)
+
+    bounds = []
+    start = 0
+    while total - start > chunk * 1.5:
+        target = (start + chunk) // frame
+        lo = max(start // frame + 1, target - search)
+        hi = min(len(smoothed) - 1, target + search)
+        cut = (lo + int(np.argmin(smoothed[lo:hi + 1]))) * frame
+        bounds.append((start, cut))
+        start = cut
+    bounds.append((start, total))
+    return bounds
@@ -0,0 +1,70 @@
+"""Compare ASR engines on one recording: speed, memory and output size.
+
+    python benchmarks/asr_engines.py meeting.mp3 --model base \
+        --engines openai-whisper:float32 faster-whisper:int8 faster-whisper:float32
+
+Each engine runs in a fresh process, so the reported peak memory (max RSS)
+covers the model load and one full transcription and nothing else. Uses the
+same thread count for every engine.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engines  # noqa: E402
+from audio import SAMPLE_RATE, load_audio  # noqa: E402
+
+
+def run(engine, compute_type, model, samples, threads, results):
+    started = time.perf_counter()
+    asr = engines.load_engine(engine, model, compute_type, threads)
+    loaded = time.perf_counter()
+    segments = asr.transcribe(samples)
+    finished = time.perf_counter()
+    results.put({
+        "load": loaded - started,
+        "transcribe": finished - loaded,
+        "words": sum(len(seg["text"].split()) for seg in segments),
+        # ru_maxrss is in KiB on Linux
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("audio", help="any ffmpeg-readable file")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--engines", nargs="+", default=["openai-whisper:float32", "faster-whisper:int8"],
+                        help="engine:compute_type pairs")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    samples = load_audio(args.audio)
+    duration = len(samples) / SAMPLE_RATE
+    print(f"{args.audio}: {duration:.0f}s of audio, model {args.model}, {args.threads} threads")
+    print(f"{'engine':<32} {'load s':>8} {'decode s':>9} {'RTF':>6} {'x real-time':>12} {'peak MB':>8} {'words':>6}")
+
+    context = multiprocessing.get_context("spawn")
+    for spec in args.engines:
+        engine, _, compute_type = spec.partition(":")
+        engine, compute_type = engines.resolve(engine, compute_type or None)
+        results = context.Queue()
+        process = context.Process(target=run, args=(engine, compute_type, args.model, samples, args.threads, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"{engine + ':' + compute_type:<32} failed (exit code {process.exitcode})")
+            continue
+        r = results.get()
+        rtf = r["transcribe"] / duration
+        print(f"{engine + ':' + compute_type:<32} {r['load']:>8.1f} {r['transcribe']:>9.1f} {rtf:>6.3f} "
+              f"{1 / rtf:>12.1f} {r['rss_mb']:>8.0f} {r['words']:>6}")
+
+
+if __name__ == "__main__":
+    main()
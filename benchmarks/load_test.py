@@ -0,0 +1,69 @@
+"""Closed-loop load generator for a running transcript server.
+
+    python benchmarks/load_test.py --url "https://youtu.be/<id>" \
+        --concurrency 32 --requests 2000
+
+Prime the cache with one request first to measure the warm (cache hit) path,
+which is what the server's own overhead looks like. Reports requests/second
+and latency percentiles.
+"""
+import argparse
+import statistics
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", default="http://127.0.0.1:5000")
+    parser.add_argument("--url", required=True, help="video URL to request")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    target = f"{args.server}/transcript?" + urllib.parse.urlencode({"url": args.url})
+    latencies = []
+    errors = [0]
+    remaining = [args.requests]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(target, timeout=300) as resp:
+                    resp.read()
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    if not latencies:
+        print(f"all {errors[0]} requests failed")
+        return
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    print(f"requests: {len(latencies)} ok, {errors[0]} failed in {elapsed:.1f}s")
+    print(f"throughput: {len(latencies) / elapsed:.1f} req/s")
+    print(f"latency ms: p50={pct(0.50):.1f} p90={pct(0.90):.1f} p99={pct(0.99):.1f} "
+          f"mean={statistics.mean(latencies) * 1000:.1f}")
+
+
+if __name__ == "__main__":
+    main()
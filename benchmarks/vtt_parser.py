@@ -0,0 +1,175 @@
+"""Time the VTT cleaner against the original per-line regex chain.
+
+    python benchmarks/vtt_parser.py --hours 4
+
+Generates a YouTube-style auto-caption file (rolling two-line cues with
+inline word timings, ``<c>`` tags, speaker marks and ``[&nbsp;__&nbsp;]``
+bleeps), cleans it with both implementations, checks that the output is
+byte-identical and prints the timings. Then collapses the rolling repeats
+and checks that exactly the spoken lines are left, each once.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from captions import VTT_NBSP_BRACKETS, cues_to_text, format_transcript_line, parse_vtt  # noqa: E402
+
+WORDS = (
+    "the council will now move to item number seven on the agenda which is the budget amendment for "
+    "fiscal year twenty five i would like to thank staff for their work on this we have a motion "
+    "and a second is there any discussion all those in favor say aye opposed motion carries "
+    "public comment is open please state your name and address for the record"
+).split()
+
+
+def _timestamp(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, rest = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{rest:06.3f}"
+
+
+def rolling_captions(hours, seed=0, spoken=None):
+    """Lines of a YouTube auto-caption VTT covering ``hours`` of speech.
+
+    Like the real thing, every cue repeats the previous cue's new line and
+    then adds a few words with ``<hh:mm:ss.mmm><c>`` word timings, followed
+    by a 10 ms cue that shows the finished pair without tags. Each new line
+    is also appended to ``spoken`` if given.
+    """
+    rng = random.Random(seed)
+    yield "WEBVTT"
+    yield "Kind: captions"
+    yield "Language: en"
+    yield ""
+    now, previous = 0.0, ""
+    while now < hours * 3600:
+        length = rng.uniform(1.5, 3.5)
+        words = [rng.choice(WORDS) for _ in range(rng.randint(4, 9))]
+        roll = rng.random()
+        if roll < 0.05:
+            words[0] = ">> " + words[0]
+        elif roll < 0.08:
+            words.insert(rng.randrange(len(words)), "[&nbsp;__&nbsp;]")
+        elif roll < 0.1:
+            words = ["[Music]"]
+        step = length / len(words)
+        timed = words[0] + "".join(
+            f"<{_timestamp(now + i * step)}><c> {word}</c>" for i, word in enumerate(words[1:], 1)
+        )
+        plain = " ".join(words)
+        if spoken is not None:
+            spoken.append(plain)
+        yield f"{_timestamp(now)} --> {_timestamp(now + length)} align:start position:0%"
+        yield previous or " "
+        yield timed
+        yield ""
+        now += length
+        yield f"{_timestamp(now)} --> {_timestamp(now + 0.01)} align:start position:0%"
+        yield previous or " "
+        yield plain
+        yield ""
+        now += 0.01
+        previous = plain
+
+
+def legacy_format_transcript_line(line):
+    line = line.strip()
+    if not line:
+        return None
+
+    line = re.sub(r'^>>\s*', '', line)
+    line = re.sub(r'\s*>>\s*', ' ', line)
+    line = re.sub(r':\s*\.', ':', line)
+    line = re.sub(r'\.\.+', '.', line)
+    line = re.sub(r'\s{2,}', ' ', line)
+    line = re.sub(r'\s*:\s*$', '', line)
+    line = re.sub(r'\s*–\s*', '-', line)
+    line = re.sub(r'\s+', ' ', line)
+
+    if line:
+        return line[0].upper() + line[1:] if not line.isupper() else line
+    return None
+
+
+def legacy_clean_vtt_lines(lines):
+    """The cleaner as it was before the single-pass rewrite, minus file I/O.
+
+    Starts at the first cue: the old cleaner also kept the ``WEBVTT`` header
+    lines, which the cue parser rightly drops.
+    """
+    text_lines = []
+    in_cues = False
+    for line in lines:
+        line = line.strip()
+        in_cues = in_cues or '-->' in line
+        if not line or '-->' in line or not in_cues:
+            continue
+
+        line = re.sub(r'<\d{2}:\d{2}:\d{2}\.\d{3}>', '', line)
+        line = re.sub(r'</?[a-zA-Z0-9]>', '', line)
+        line = re.sub(r'\[\s*&nbsp;.*?&nbsp;\s*\]', '', line, flags=re.IGNORECASE)
+        if re.match(r'^\[\s*\]$', line):
+            continue
+
+        text_lines.append(line)
+
+    cleaned = []
+    for line in "\n".join(text_lines).splitlines():
+        line = legacy_format_transcript_line(line)
+        if line:
+            cleaned.append(line)
+    return "\n\n".join(cleaned)
+
+
+def clean_vtt_lines(lines):
+    return cues_to_text(parse_vtt(lines, rolling=False))
+
+
+def collapse_vtt_lines(lines):
+    return cues_to_text(parse_vtt(lines))
+
+
+def best_of(repeat, func, lines):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = func(lines)
+        timings.append(time.perf_counter() - started)
+    return min(timings), output
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=float, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    spoken = []
+    lines = [line + "\n" for line in rolling_captions(args.hours, spoken=spoken)]
+    print(f"{args.hours:g} h of auto-captions: {len(lines)} lines, {sum(map(len, lines)) / 1e6:.1f} MB")
+
+    legacy_seconds, legacy = best_of(args.repeat, legacy_clean_vtt_lines, lines)
+    seconds, output = best_of(args.repeat, clean_vtt_lines, lines)
+    print(f"{'regex chain':<14} {legacy_seconds:>7.3f}s  {len(legacy) / 1e6:>5.1f} MB of text")
+    print(f"{'single pass':<14} {seconds:>7.3f}s  {len(output) / 1e6:>5.1f} MB  ({legacy_seconds / seconds:.1f}x)")
+    if output != legacy:
+        sys.exit("Output differs from the regex chain")
+    print("Output is byte-identical")
+
+    collapsed_seconds, collapsed = best_of(args.repeat, collapse_vtt_lines, lines)
+    print(f"{'collapsed':<14} {collapsed_seconds:>7.3f}s  {len(collapsed) / 1e6:>5.1f} MB  "
+          f"({len(output) / len(collapsed):.1f}x smaller)")
+    spoken = [format_transcript_line(VTT_NBSP_BRACKETS.sub("", line)) for line in spoken]
+    expected = "\n\n".join(filter(None, spoken))
+    if collapsed != expected:
+        sys.exit("Collapsed output is not the spoken lines")
+    print("Every spoken line is kept exactly once")
+
+
+if __name__ == "__main__":
+    main()
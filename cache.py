@@ -0,0 +1,239 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlparse, parse_qs, parse_qsl, urlencode, urlunparse
+
+from metrics import CACHE_REQUESTS
+
+# How long a result stays valid, by the method that produced it. Auto captions
+# get corrected or replaced, so they expire sooner than our own Whisper output.
+METHOD_TTLS = {
+    "youtube_transcript_api": 24 * 60 * 60,
+    "yt-dlp subtitles": 24 * 60 * 60,
+    "html vtt": 7 * 24 * 60 * 60,
+    "whisper": 30 * 24 * 60 * 60,
+}
+DEFAULT_TTL = 24 * 60 * 60
+
+YOUTUBE_ID_RE = re.compile(r'^[A-Za-z0-9_-]{11}$')
+TRACKING_PARAMS = {"fbclid", "gclid", "si", "feature"}
+
+
+def canonical_media_id(url):
+    """Return a stable identity for the media behind ``url``.
+
+    Different URLs for the same recording (``youtu.be`` vs ``watch?v=``,
+    Vimeo player embeds, extra tracking parameters) map to the same id.
+    """
+    url = url.strip()
+    parsed = urlparse(url if "://" in url else "https://" + url)
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www.") or host.startswith("m."):
+        host = host.split(".", 1)[1]
+    path_parts = [p for p in parsed.path.split("/") if p]
+    query = parse_qs(parsed.query)
+
+    if host == "youtu.be" and path_parts:
+        video_id = path_parts[0]
+    elif host in ("youtube.com", "music.youtube.com", "youtube-nocookie.com"):
+        video_id = query.get("v", [None])[0]
+        if not video_id and len(path_parts) >= 2 and path_parts[0] in ("shorts", "embed", "live", "v"):
+            video_id = path_parts[1]
+    else:
+        video_id = None
+    if video_id and YOUTUBE_ID_RE.match(video_id):
+        return f"youtube:{video_id}"
+
+    if host.endswith("viebit.com") and query.get("hash"):
+        return f"viebit:{query['hash'][0]}"
+
+    if host.endswith("vimeo.com"):
+        numeric = [p for p in path_parts if p.isdigit()]
+        if numeric:
+            return f"vimeo:{numeric[0]}"
+
+    return "url:" + normalize_url(url)
+
+
+def normalize_url(url):
+    parsed = urlparse(url if "://" in url else "https://" + url)
+    scheme = parsed.scheme.lower()
+    netloc = (parsed.hostname or "").lower()
+    if parsed.port and (scheme, parsed.port) not in (("http", 80), ("https", 443)):
+        netloc += f":{parsed.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if k not in TRACKING_PARAMS and not k.startswith("utm_")
+    )
+    path = parsed.path.rstrip("/") or "/"
+    return urlunparse((scheme, netloc, path, "", urlencode(query), ""))
+
+
+class TranscriptCache:
+    """Size-bounded LRU cache of pipeline results, persisted in SQLite.
+
+    Entries expire after a TTL chosen by the method that produced them and
+    the least recently used ones are evicted once ``max_bytes`` is exceeded.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttls=None):
+        self.max_bytes = max_bytes
+        self.ttls = METHOD_TTLS if ttls is None else ttls
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS transcripts ("
+            " key TEXT PRIMARY KEY,"
+            " method TEXT,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS transcripts_lru ON transcripts (last_access)")
+        self.db.commit()
+
+    def get(self, key, record=True):
+        """Cached result under ``key``, or None.
+
+        With ``record=False`` the lookup is left out of the hit/miss metrics,
+        for callers that probe several keys per request and report the
+        request once through ``record_lookup``.
+        """
+        now = time.time()
+        with self.lock:
+            row = self.db.execute(
+                "SELECT value, expires_at FROM transcripts WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] <= now:
+                self.db.execute("DELETE FROM transcripts WHERE key = ?", (key,))
+                self.db.commit()
+                row = None
+            if row is not None:
+                self.db.execute("UPDATE transcripts SET last_access = ? WHERE key = ?", (now, key))
+                self.db.commit()
+        if record:
+            self.record_lookup(row is not None)
+        return None if row is None else json.loads(row[0])
+
+    def record_lookup(self, hit):
+        CACHE_REQUESTS.inc("hit" if hit else "miss")
+
+    def ttl(self, method):
+        # "whisper:small" and friends share the "whisper" TTL
+        family = (method or "").partition(":")[0]
+        return self.ttls.get(method, self.ttls.get(family, DEFAULT_TTL))
+
+    def set(self, key, result):
+        method = result.get("method")
+        value = json.dumps(result)
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?, ?)",
+                (key, method, value, len(value), now + self.ttl(method), now),
+            )
+            self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        self.db.execute("DELETE FROM transcripts WHERE expires_at <= ?", (time.time(),))
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self.db.execute("SELECT key, size FROM transcripts ORDER BY last_access").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self.db.executemany("DELETE FROM transcripts WHERE key = ?", evicted)
+        logging.info(f"Transcript cache evicted {len(evicted)} entries")
+
+
+class _Flight:
+    def __init__(self):
+        self.future = Future()
+        self.lock = threading.Lock()
+        # Everything the run has reported so far, replayed to late joiners
+        self.segments = []
+        self.listeners = []
+
+    def subscribe(self, on_segment):
+        with self.lock:
+            for segment in self.segments:
+                on_segment(segment)
+            self.listeners.append(on_segment)
+
+    def unsubscribe(self, on_segment):
+        with self.lock:
+            self.listeners.remove(on_segment)
+
+    def publish(self, segment):
+        with self.lock:
+            self.segments.append(segment)
+            for listener in self.listeners:
+                listener(segment)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one computation.
+
+    The first caller for a key runs ``func``; callers arriving while it is
+    still running wait for and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.calls
+
+    def __len__(self):
+        with self.lock:
+            return len(self.calls)
+
+    def do(self, key, func, *args, wait_timeout=None, on_segment=None, **kwargs):
+        """Run ``func(*args, on_segment=..., **kwargs)`` once per ``key`` at a time.
+
+        Each segment ``func`` reports goes to the ``on_segment`` of every
+        caller sharing the run, including the segments reported before that
+        caller joined. Callers that join an in-flight run wait at most
+        ``wait_timeout`` seconds and get ``concurrent.futures.TimeoutError``
+        after that.
+        """
+        with self.lock:
+            flight = self.calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.calls[key] = _Flight()
+        if on_segment:
+            flight.subscribe(on_segment)
+
+        try:
+            if not leader:
+                logging.info(f"Joining in-flight transcript for {key}")
+                return flight.future.result(timeout=wait_timeout)
+
+            try:
+                result = func(*args, on_segment=flight.publish, **kwargs)
+            except BaseException as e:
+                flight.future.set_exception(e)
+                raise
+            else:
+                flight.future.set_result(result)
+                return result
+            finally:
+                with self.lock:
+                    del self.calls[key]
+        finally:
+            if on_segment:
+                flight.unsubscribe(on_segment)
@@ -0,0 +1,214 @@
+"""Parsing and cleaning of WebVTT captions into timed cues.
+
+A ``Cue`` is one caption block: its start and end in seconds and its
+cleaned text, one formatted caption line per ``\\n``. Cues keep the timing
+that plain transcript text throws away, so a parsed caption file can be
+cached once and later sliced to a time range or rendered in another format
+without downloading or parsing it again.
+"""
+import re
+
+# Compiled once; every pattern below is only run on lines that contain the
+# character it needs, which most caption lines do not
+SPEAKER_PREFIX = re.compile(r'^>>\s*')
+SPEAKER_MARK = re.compile(r'\s*>>\s*')
+COLON_DOT = re.compile(r':\s*\.')
+ELLIPSIS = re.compile(r'\.\.+')
+WHITESPACE = re.compile(r'\s+')
+TRAILING_COLON = re.compile(r'\s*:\s*$')
+EN_DASH = re.compile(r'\s*–\s*')
+VTT_TIMESTAMP_TAG = re.compile(r'<\d{2}:\d{2}:\d{2}\.\d{3}>')
+VTT_TAG = re.compile(r'</?[a-zA-Z0-9]>')
+VTT_NBSP_BRACKETS = re.compile(r'\[\s*&nbsp;.*?&nbsp;\s*\]', re.IGNORECASE)
+VTT_EMPTY_BRACKETS = re.compile(r'^\[\s*\]$')
+LINE_BREAK = re.compile(r'\r\n|\r|\n')
+
+# Rolling auto-captions repeat the previous cue's lines at the top of the
+# next one, which starts right where it ended (small gaps are rounding)
+ROLLING_GAP_SECONDS = 0.5
+# YouTube also shows every finished pair again in a 10 ms cue of its own
+ROLLING_FLASH_SECONDS = 0.1
+
+
+class Cue:
+    """One timed caption; ``text`` holds its cleaned lines joined by ``\\n``."""
+
+    __slots__ = ("start", "end", "text")
+
+    def __init__(self, start, end, text):
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def as_list(self):
+        """``[start, end, text]``, the ``segments`` form used in results and the cache."""
+        return [self.start, self.end, self.text]
+
+    def __repr__(self):
+        return f"Cue({self.start!r}, {self.end!r}, {self.text!r})"
+
+
+def in_time_range(start, end, time_range):
+    """Whether a cue from ``start`` to ``end`` overlaps ``time_range``."""
+    if time_range is None:
+        return True
+    range_start, range_end = time_range
+    return (range_end is None or start < range_end) and (range_start is None or end > range_start)
+
+
+def parse_vtt_timestamp(value):
+    """Seconds in a WebVTT timestamp such as ``01:02:03.456`` or ``02:03.456``."""
+    if len(value) == 12 and value[2] == ':' and value[5] == ':' and value[8] in '.,':
+        # The form nearly every caption file uses, in whole milliseconds
+        return (int(value[:2]) * 3600000 + int(value[3:5]) * 60000
+                + int(value[6:8]) * 1000 + int(value[9:])) / 1000
+    seconds = 0.0
+    for part in value.replace(",", ".").split(":"):
+        seconds = seconds * 60 + float(part)
+    # VTT has millisecond precision; keep float noise out of the JSON
+    return round(seconds, 3)
+
+
+def iter_text_lines(chunks):
+    """Lines of the text ``chunks``, split like a file opened in text mode.
+
+    Lets ``parse_vtt`` read an HTTP response as it arrives. Unlike
+    ``requests``' ``iter_lines``, a ``\\r\\n`` split across two chunks never
+    turns into an extra (cue-ending) blank line.
+    """
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        # A trailing \r may be the first half of a \r\n in the next chunk
+        end = len(pending) - 1 if pending.endswith("\r") else len(pending)
+        lines = LINE_BREAK.split(pending[:end])
+        pending = lines.pop() + pending[end:]
+        yield from lines
+    if pending:
+        yield pending[:-1] if pending.endswith("\r") else pending
+
+
+def format_transcript_line(line):
+    line = line.strip()
+    if not line:
+        return None
+
+    if '>>' in line:
+        line = SPEAKER_PREFIX.sub('', line)
+        line = SPEAKER_MARK.sub(' ', line)
+    if ':' in line:
+        line = COLON_DOT.sub(':', line)
+    if '..' in line:
+        line = ELLIPSIS.sub('.', line)
+    # One pass does the work of collapsing runs and then normalizing single
+    # tabs etc.; the colon and dash rules below treat all whitespace alike
+    line = WHITESPACE.sub(' ', line)
+    if ':' in line:
+        line = TRAILING_COLON.sub('', line)
+    if '–' in line:
+        line = EN_DASH.sub('-', line)
+
+    if line:
+        return line[0].upper() + line[1:] if not line.isupper() else line
+    return None
+
+
+def _rolling_overlap(previous, start, end, lines):
+    """How many leading ``lines`` of a cue repeat the end of the ``previous`` one.
+
+    ``previous`` is ``(end, lines)`` of the cue before, as it was displayed.
+    Only the suffix of the previous cue that is also a prefix of this one
+    counts, so a phrase said twice further apart is never dropped. A cue
+    that repeats nothing but lines already shown is only dropped if it is a
+    flash cue, not a caption that legitimately says the same thing again.
+    """
+    previous_end, shown = previous
+    if start - previous_end > ROLLING_GAP_SECONDS:
+        return 0
+    for n in range(min(len(shown), len(lines)), 0, -1):
+        if shown[-n:] == lines[:n]:
+            if n < len(lines) or end - start <= ROLLING_FLASH_SECONDS:
+                return n
+    return 0
+
+
+def parse_vtt(lines, on_segment=None, time_range=None, rolling=True):
+    """Cues of the VTT ``lines`` that overlap ``time_range``, in one pass.
+
+    Inline tags and ``&nbsp;`` brackets are dropped and each caption line is
+    formatted as it is read; ``on_segment`` gets every formatted line once
+    its cue is complete. Text outside cues (the header, cue ids, ``NOTE``
+    blocks) is skipped, as are cues with unreadable timings or no text left
+    after cleaning.
+
+    With ``rolling``, lines that a cue only repeats from the one before it
+    (YouTube's rolling auto-captions show every line two to four times) are
+    dropped, in constant time per cue.
+    """
+    cues = []
+    # (end, lines) of the last cue, before its repeated lines were dropped
+    previous = None
+
+    def add(start, end, text):
+        nonlocal previous
+        shown = text
+        if rolling and previous is not None:
+            text = text[_rolling_overlap(previous, start, end, text):]
+        previous = (end, shown)
+        if text:
+            cues.append(Cue(start, end, "\n".join(text)))
+            if on_segment:
+                for line in text:
+                    on_segment(line)
+
+    # Formatted lines of the current cue; None between cues
+    text = None
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            # Only a truly empty line ends a cue; YouTube pads cues with " "
+            if text is not None and not line.strip('\r\n'):
+                if text:
+                    add(start, end, text)
+                text = None
+            continue
+        line = stripped
+        if '-->' in line:
+            if text:
+                add(start, end, text)
+            text = None
+            try:
+                cue_start, _, rest = line.partition('-->')
+                start = parse_vtt_timestamp(cue_start.strip())
+                end = parse_vtt_timestamp(rest.split()[0])
+            except (ValueError, IndexError):
+                continue
+            if in_time_range(start, end, time_range):
+                text = []
+            continue
+        if text is None:
+            continue
+
+        if '<' in line:
+            line = VTT_TIMESTAMP_TAG.sub('', line)
+            line = VTT_TAG.sub('', line)
+        if '[' in line:
+            if '&' in line:
+                line = VTT_NBSP_BRACKETS.sub('', line)
+            if line[:1] == '[' and VTT_EMPTY_BRACKETS.match(line):
+                continue
+
+        # Other line separators (\x0b, \u2028, ...) split a caption line too
+        for part in (line,) if line.isprintable() else line.splitlines():
+            part = format_transcript_line(part)
+            if part:
+                text.append(part)
+
+    if text:
+        add(start, end, text)
+    return cues
+
+
+def cues_to_text(cues):
+    """Transcript text of parsed VTT cues: one paragraph per caption line."""
+    return "\n\n".join(line for cue in cues for line in cue.text.split("\n"))
@@ -0,0 +1,116 @@
+"""Scratch-disk checkpoints for long Whisper runs.
+
+A checkpoint holds one run's decoded audio, its chunk plan and the segments
+of every chunk that has finished. If the server or a worker dies part way
+through a multi-hour recording, the next run with the same settings reloads
+all of that and only decodes the chunks that are missing.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRATCH_DIR = os.environ.get("WHISPER_SCRATCH_DIR", os.path.join(BASE_DIR, "whisper_scratch"))
+# Abandoned checkpoints are deleted after this long
+CHECKPOINT_TTL_SECONDS = int(os.environ.get("WHISPER_CHECKPOINT_TTL", 24 * 60 * 60))
+
+
+def _write_atomically(path, write):
+    # A crash mid-write must never leave a truncated file that looks finished
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Checkpoint:
+    """One run's scratch directory, keyed by everything that shapes its output."""
+
+    def __init__(self, key, root=SCRATCH_DIR):
+        digest = hashlib.sha256(json.dumps(key).encode()).hexdigest()[:32]
+        self.path = os.path.join(root, digest)
+        # Chunks are saved from executor callbacks, which can still be
+        # running when the finished run removes the checkpoint
+        self.lock = threading.Lock()
+        self.removed = False
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def load_audio(self):
+        """The decoded recording as float32 samples, or None if not saved."""
+        try:
+            # Stored as int16, half the size of float32 and lossless for ffmpeg's s16le output
+            return np.load(self._file("audio.npy")).astype(np.float32) / 32768.0
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logging.warning(f"Ignoring unreadable checkpoint audio in {self.path}: {e}")
+            return None
+
+    def save_audio(self, samples):
+        os.makedirs(self.path, exist_ok=True)
+        pcm = np.round(samples * 32768.0).clip(-32768, 32767).astype(np.int16)
+        _write_atomically(self._file("audio.npy"), lambda f: np.save(f, pcm))
+
+    def load_plan(self):
+        """``(regions, bounds)`` of the saved run, or None."""
+        plan = self._load_json("plan.json")
+        if plan is None:
+            return None
+        return [tuple(r) for r in plan["regions"]], [tuple(b) for b in plan["bounds"]]
+
+    def save_plan(self, regions, bounds):
+        data = json.dumps({
+            "regions": [[int(start), int(end)] for start, end in regions],
+            "bounds": [[int(start), int(end)] for start, end in bounds],
+        }).encode()
+        _write_atomically(self._file("plan.json"), lambda f: f.write(data))
+
+    def load_chunk(self, index):
+        """Segments of chunk ``index`` if it finished in an earlier run, else None."""
+        return self._load_json(f"chunk-{index:05d}.json")
+
+    def save_chunk(self, index, segments):
+        with self.lock:
+            if not self.removed:
+                data = json.dumps(segments).encode()
+                _write_atomically(self._file(f"chunk-{index:05d}.json"), lambda f: f.write(data))
+
+    def remove(self):
+        with self.lock:
+            self.removed = True
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def _load_json(self, name):
+        try:
+            with open(self._file(name), "rb") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable checkpoint file {name} in {self.path}: {e}")
+            return None
+
+
+def sweep(root=SCRATCH_DIR, ttl=CHECKPOINT_TTL_SECONDS):
+    """Delete checkpoints that have not been touched for ``ttl`` seconds."""
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - ttl
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            newest = max([os.path.getmtime(path)] + [os.path.getmtime(os.path.join(path, f)) for f in os.listdir(path)])
+        except OSError:
+            continue
+        if newest < cutoff:
+            logging.info(f"Removing stale Whisper checkpoint {path}")
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,145 @@
+"""Speech-recognition engines the Whisper server can run.
+
+Every engine loads one model and turns float32 16 kHz samples into a list of
+``{"start", "end", "text"}`` segments (seconds relative to the samples). With
+``word_timestamps`` each segment also gets ``words``, a list of
+``[start, end, word]`` triples. ``transcribe_batch`` does the same for a
+list of windows of at most 30 s each, ideally in one batched pass.
+
+- ``openai-whisper``: the reference PyTorch implementation, fp32 on CPU.
+- ``faster-whisper``: the same models on CTranslate2, with quantized
+  ``int8`` weights by default. Several times faster on CPU and much smaller
+  in memory, for near-identical output.
+
+Engine libraries are imported when a model is loaded, so only the engines a
+deployment actually uses need to be installed.
+"""
+import os
+
+from audio import SAMPLE_RATE
+
+DEFAULT_ENGINE = os.environ.get("WHISPER_ENGINE", "openai-whisper")
+# Empty means the engine's own default (see DEFAULT_COMPUTE_TYPES)
+DEFAULT_COMPUTE_TYPE = os.environ.get("WHISPER_COMPUTE_TYPE") or None
+
+
+class OpenAIWhisperEngine:
+    name = "openai-whisper"
+    compute_types = ("float32",)
+    # Decode time relative to openai-whisper, for model auto-selection
+    relative_rtf = 1.0
+
+    def __init__(self, model_name, compute_type="float32", threads=1):
+        import torch
+        import whisper
+
+        torch.set_num_threads(threads)
+        self.model = whisper.load_model(model_name)
+        self.tokenizer = whisper.tokenizer.get_tokenizer(
+            self.model.is_multilingual, num_languages=self.model.num_languages
+        )
+
+    def transcribe(self, samples, word_timestamps=False):
+        result = self.model.transcribe(samples, fp16=False, word_timestamps=word_timestamps)
+        segments = []
+        for seg in result["segments"]:
+            segment = {"start": seg["start"], "end": seg["end"], "text": seg["text"].strip()}
+            if word_timestamps:
+                segment["words"] = [[w["start"], w["end"], w["word"].strip()] for w in seg.get("words", [])]
+            segments.append(segment)
+        return segments
+
+    def transcribe_batch(self, windows, word_timestamps=False):
+        """Decode the windows with one batched encoder and decoder pass.
+
+        Unlike ``transcribe`` there is no temperature fallback, which is fine
+        for the short, clean clips that get batched.
+        """
+        if word_timestamps:
+            # Word alignment runs per window anyway, so there is nothing to share
+            return [self.transcribe(window, True) for window in windows]
+
+        import torch
+        import whisper
+
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(window), self.model.dims.n_mels)
+            for window in windows
+        ]).to(self.model.device)
+        results = whisper.decode(self.model, mels, whisper.DecodingOptions(fp16=False))
+        return [self._segments(result, len(window) / SAMPLE_RATE) for window, result in zip(windows, results)]
+
+    def _segments(self, result, duration):
+        # Timestamp tokens bracket every segment: <|0.00|> text <|2.40|>
+        begin = self.tokenizer.timestamp_begin
+        segments, start, text = [], 0.0, []
+        for token in result.tokens:
+            if token < begin:
+                text.append(token)
+                continue
+            time = (token - begin) * 0.02
+            if text:
+                segments.append({
+                    "start": start, "end": min(time, duration), "text": self.tokenizer.decode(text).strip(),
+                })
+                text = []
+            start = time
+        if text:
+            segments.append({"start": start, "end": duration, "text": self.tokenizer.decode(text).strip()})
+        return [seg for seg in segments if seg["text"]]
+
+
+class FasterWhisperEngine:
+    name = "faster-whisper"
+    compute_types = ("int8", "int8_float32", "int16", "float32")
+    relative_rtf = 0.35
+
+    def __init__(self, model_name, compute_type="int8", threads=1):
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(model_name, device="cpu", compute_type=compute_type, cpu_threads=threads)
+
+    def transcribe(self, samples, word_timestamps=False):
+        result, _ = self.model.transcribe(samples, beam_size=5, word_timestamps=word_timestamps)
+        # ``result`` is a generator; decoding happens while it is consumed
+        segments = []
+        for seg in result:
+            segment = {"start": seg.start, "end": seg.end, "text": seg.text.strip()}
+            if word_timestamps:
+                segment["words"] = [[w.start, w.end, w.word.strip()] for w in seg.words or []]
+            segments.append(segment)
+        return segments
+
+    def transcribe_batch(self, windows, word_timestamps=False):
+        # CTranslate2 only batches within one recording, so decode the windows in turn
+        return [self.transcribe(window, word_timestamps) for window in windows]
+
+
+ENGINES = {engine.name: engine for engine in (OpenAIWhisperEngine, FasterWhisperEngine)}
+DEFAULT_COMPUTE_TYPES = {"openai-whisper": "float32", "faster-whisper": "int8"}
+
+
+def resolve(engine=None, compute_type=None):
+    """Fill in deployment defaults; returns ``(engine, compute_type)``.
+
+    Raises ``ValueError`` for an unknown engine or compute type.
+    """
+    engine = engine or DEFAULT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown ASR engine {engine!r}, expected one of {', '.join(ENGINES)}")
+    if compute_type is None and engine == DEFAULT_ENGINE:
+        compute_type = DEFAULT_COMPUTE_TYPE
+    compute_type = compute_type or DEFAULT_COMPUTE_TYPES[engine]
+    if compute_type not in ENGINES[engine].compute_types:
+        raise ValueError(
+            f"{engine} does not support compute type {compute_type!r}, "
+            f"expected one of {', '.join(ENGINES[engine].compute_types)}"
+        )
+    return engine, compute_type
+
+
+def load_engine(engine, model_name, compute_type, threads=1):
+    try:
+        return ENGINES[engine](model_name, compute_type, threads)
+    except ImportError as e:
+        raise RuntimeError(f"ASR engine {engine} is not installed: {e}") from e
@@ -0,0 +1,101 @@
+"""Render one transcript result in the formats clients ask for.
+
+Every renderer works off the result dict the pipeline caches: its
+``transcript`` for plain text and its ``[start, end, text]`` ``segments``
+for everything timed. Switching formats is a re-render of the cached entry,
+never another run of the pipeline.
+
+- ``text``: the transcript as produced by its source.
+- ``paragraphs``: cue text joined into paragraphs, broken at pauses.
+- ``srt`` and ``vtt``: subtitle files for video editors.
+- ``cues``: ``{"start", "end", "text"}`` objects as JSON, for indexing.
+"""
+import html
+import json
+
+from captions import Cue
+
+# A pause at least this long between cues starts a new paragraph
+PARAGRAPH_GAP_SECONDS = 2.0
+# Past this many characters a paragraph ends at the next sentence end, and
+# at twice this many wherever it is (auto-captions have no punctuation)
+PARAGRAPH_CHARS = 600
+
+
+def _cues(result):
+    if "segments" not in result:
+        raise ValueError("This transcript has no timings; request it without format or with format=text")
+    return [Cue(*segment) for segment in result["segments"]]
+
+
+def _timestamp(seconds, separator):
+    ms = round(seconds * 1000)
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{ms:03d}"
+
+
+def render_text(result):
+    return result["transcript"]
+
+
+def render_paragraphs(result):
+    paragraphs, current, length, last_end = [], [], 0, None
+    for cue in _cues(result):
+        text = " ".join(cue.text.split())
+        if current and (
+            cue.start - last_end >= PARAGRAPH_GAP_SECONDS
+            or (length >= PARAGRAPH_CHARS and current[-1].endswith((".", "?", "!")))
+            or length >= 2 * PARAGRAPH_CHARS
+        ):
+            paragraphs.append(" ".join(current))
+            current, length = [], 0
+        current.append(text)
+        length += len(text) + 1
+        last_end = cue.end
+    if current:
+        paragraphs.append(" ".join(current))
+    return "\n\n".join(paragraphs)
+
+
+def render_srt(result):
+    blocks = []
+    for number, cue in enumerate(_cues(result), 1):
+        blocks.append(f"{number}\n{_timestamp(cue.start, ',')} --> {_timestamp(cue.end, ',')}\n{cue.text}\n")
+    return "\n".join(blocks)
+
+
+def render_vtt(result):
+    blocks = ["WEBVTT\n"]
+    for cue in _cues(result):
+        # Cue text is plain text; & and < would otherwise read as markup
+        blocks.append(f"{_timestamp(cue.start, '.')} --> {_timestamp(cue.end, '.')}\n"
+                      f"{html.escape(cue.text, quote=False)}\n")
+    return "\n".join(blocks)
+
+
+def render_cues(result):
+    return json.dumps({
+        "method": result.get("method", "unknown"),
+        "cues": [{"start": cue.start, "end": cue.end, "text": cue.text} for cue in _cues(result)],
+    })
+
+
+FORMATS = {
+    "text": (render_text, "text/plain; charset=utf-8"),
+    "paragraphs": (render_paragraphs, "text/plain; charset=utf-8"),
+    "srt": (render_srt, "application/x-subrip; charset=utf-8"),
+    "vtt": (render_vtt, "text/vtt; charset=utf-8"),
+    "cues": (render_cues, "application/json"),
+}
+
+
+def render(result, fmt):
+    """``(body, content_type)`` of ``result`` in ``fmt``.
+
+    Raises ``ValueError`` if a timed format is asked of a result without
+    ``segments``.
+    """
+    renderer, content_type = FORMATS[fmt]
+    return renderer(result), content_type
@@ -0,0 +1,281 @@
+import queue
+import threading
+import time
+import uuid
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Finished jobs are kept around this long so clients can still fetch them
+JOB_RETENTION_SECONDS = 60 * 60
+# Retry-After sent when the job backlog is full
+JOB_RETRY_AFTER_SECONDS = 30
+
+
+class JobManager:
+    """Runs transcript jobs on a background thread pool.
+
+    Request threads only submit work and read job state, so they never block
+    on yt-dlp or Whisper. Clients poll ``get`` or long-poll with ``wait``.
+    """
+
+    def __init__(self, func, max_workers=4, max_queued=64, retention=JOB_RETENTION_SECONDS):
+        self.func = func
+        self.max_queued = max_queued
+        self.retention = retention
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcript-job")
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def submit(self, url, timeout=None, func=None, options=None, job_id=None):
+        """Queue ``url``; ``func`` overrides the manager's default job function.
+
+        ``options`` are passed on to ``func`` as its ``options`` argument.
+        Raises ``QueueFull`` when ``max_queued`` jobs are already waiting for
+        a worker thread.
+        """
+        job_id = job_id or uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "url": url,
+            "timeout": timeout,
+            "options": options,
+            "func": func or self.func,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+        }
+        with self.lock:
+            self._expire_old_jobs()
+            queued = sum(1 for other in self.jobs.values() if other["status"] == "queued")
+            if queued >= self.max_queued:
+                raise QueueFull(JOB_RETRY_AFTER_SECONDS, "Too many transcript jobs queued, retry later")
+            self.jobs[job_id] = job
+        self.executor.submit(self._run, job_id)
+        return self._snapshot(job)
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def wait(self, job_id, timeout):
+        """Block until the job finishes or ``timeout`` seconds pass."""
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            job = self.jobs.get(job_id)
+            while job and job["status"] in ("queued", "running"):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.changed.wait(remaining)
+            return self._snapshot(job) if job else None
+
+    def stats(self):
+        """Number of jobs in each status."""
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        with self.lock:
+            for job in self.jobs.values():
+                counts[job["status"]] += 1
+        return counts
+
+    def _run(self, job_id):
+        self._update(job_id, status="running", started_at=time.time())
+        try:
+            job = self.jobs[job_id]
+            result = job["func"](job["url"], job["timeout"], ticket=job_id, options=job["options"])
+        except Exception as e:
+            logging.error(f"Job {job_id} crashed: {e}")
+            result = {"error": str(e)}
+
+        status = "failed" if "error" in result else "done"
+        self._update(job_id, status=status, finished_at=time.time(), result=result)
+
+    def _update(self, job_id, **fields):
+        with self.lock:
+            self.jobs[job_id].update(fields)
+            self.changed.notify_all()
+
+    def _expire_old_jobs(self):
+        cutoff = time.time() - self.retention
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job["finished_at"] and job["finished_at"] < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    @staticmethod
+    def _snapshot(job):
+        snapshot = dict(job)
+        del snapshot["func"]
+        return snapshot
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after, message="Whisper queue is full, retry later"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """Caps how many expensive runs execute at once and how many may wait.
+
+    Waiters are served in FIFO order. ``position`` reports where a ticket is
+    in the queue so callers can be told how long they have to wait.
+    Background jobs take their place with ``reserve`` when they are
+    submitted, so the line also counts jobs that no worker thread has picked
+    up yet; those never hold up the waiters behind them, though.
+    """
+
+    def __init__(self, max_running=1, max_waiting=8, expected_seconds=120):
+        self.max_running = max_running
+        self.max_waiting = max_waiting
+        self.running = 0
+        self.waiting = deque()
+        # Tickets in ``waiting`` whose thread is actually blocked in ``slot``
+        self.present = set()
+        # Moving average of run time, used for Retry-After estimates
+        self.expected_seconds = expected_seconds
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def is_saturated(self):
+        with self.lock:
+            return self.running >= self.max_running or bool(self.waiting)
+
+    def is_full(self):
+        with self.lock:
+            return len(self.waiting) >= self.max_waiting
+
+    def position(self, ticket):
+        """1-based queue position of ``ticket``, or None if it is not waiting."""
+        with self.lock:
+            try:
+                return self.waiting.index(ticket) + 1
+            except ValueError:
+                return None
+
+    def retry_after(self, position=None):
+        with self.lock:
+            return self._retry_after(len(self.waiting) if position is None else position)
+
+    def stats(self):
+        with self.lock:
+            return {"running": self.running, "waiting": len(self.waiting)}
+
+    def reserve(self, ticket):
+        """Take a place in line for ``ticket`` now, ahead of its ``slot`` call.
+
+        Raises ``QueueFull`` when the line is already at ``max_waiting``. The
+        caller must ``release`` the ticket if it never gets to run.
+        """
+        with self.lock:
+            if len(self.waiting) >= self.max_waiting:
+                raise QueueFull(self._retry_after(len(self.waiting)))
+            self.waiting.append(ticket)
+
+    def release(self, ticket):
+        """Give up a reserved place that was not used."""
+        with self.lock:
+            if ticket in self.waiting and ticket not in self.present:
+                self.waiting.remove(ticket)
+                self.changed.notify_all()
+
+    def _retry_after(self, ahead):
+        return int((ahead // self.max_running + 1) * self.expected_seconds)
+
+    def _next(self):
+        # Reserved tickets whose job has not started yet keep their position
+        # but cannot take a slot, so they must not block anyone
+        return next((ticket for ticket in self.waiting if ticket in self.present), None)
+
+    @contextmanager
+    def slot(self, ticket=None, timeout=None):
+        """Hold one run slot, waiting in line for at most ``timeout`` seconds.
+
+        Raises ``QueueFull`` when the line is already at ``max_waiting`` and
+        ``TimeoutError`` when the slot does not free up in time.
+        """
+        ticket = ticket or uuid.uuid4().hex
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            reserved = ticket in self.waiting
+            if reserved or self.running >= self.max_running or self._next() is not None:
+                if not reserved:
+                    if len(self.waiting) >= self.max_waiting:
+                        raise QueueFull(self._retry_after(len(self.waiting)))
+                    self.waiting.append(ticket)
+                self.present.add(ticket)
+                try:
+                    while self._next() != ticket or self.running >= self.max_running:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            raise TimeoutError("Timed out waiting for a Whisper slot")
+                        self.changed.wait(remaining)
+                finally:
+                    self.waiting.remove(ticket)
+                    self.present.discard(ticket)
+                    self.changed.notify_all()
+            self.running += 1
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self.lock:
+                self.running -= 1
+                self.expected_seconds = 0.8 * self.expected_seconds + 0.2 * elapsed
+                self.changed.notify_all()
+
+
+class BatchRunner:
+    """Fans a batch of URLs out over two bounded thread pools.
+
+    Every URL first goes through ``first`` (the cheap caption lookups) on a
+    wide pool. Only URLs whose result is an error move on to ``fallback``
+    (Whisper) on a separate, narrow pool, so a handful of expensive jobs
+    never hold up the subtitle fetches. URLs sharing a ``key`` run once.
+    """
+
+    def __init__(self, first, fallback, key, first_workers=8, fallback_workers=1):
+        self.first = first
+        self.fallback = fallback
+        self.key = key
+        self.first_executor = ThreadPoolExecutor(max_workers=first_workers, thread_name_prefix="batch-subtitles")
+        self.fallback_executor = ThreadPoolExecutor(max_workers=fallback_workers, thread_name_prefix="batch-whisper")
+
+    def run(self, urls):
+        """Yield ``(url, result)`` pairs in order of completion."""
+        groups = {}
+        for url in urls:
+            groups.setdefault(self.key(url), []).append(url)
+
+        finished = queue.Queue()
+        for key, group in groups.items():
+            self._submit(self.first_executor, self.first, key, group[0], finished, fallback=True)
+
+        for _ in range(len(groups)):
+            key, result = finished.get()
+            for url in groups[key]:
+                yield url, result
+
+    def _submit(self, executor, func, key, url, finished, fallback):
+        def done(future):
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"Batch item {url} crashed: {e}")
+                result = {"error": str(e)}
+
+            if fallback and "error" in result:
+                self._submit(self.fallback_executor, self.fallback, key, url, finished, fallback=False)
+            else:
+                finished.put((key, result))
+
+        executor.submit(func, url).add_done_callback(done)
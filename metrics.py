@@ -0,0 +1,206 @@
+"""Minimal Prometheus-style metrics: counters, histograms and gauges.
+
+Everything lives in the process-wide ``REGISTRY`` and is rendered in the
+Prometheus text exposition format by ``render``.
+"""
+import bisect
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+
+# Pipeline stages run from a few milliseconds (cache-warm caption fetches) to
+# hours (Whisper on a budget hearing), so the buckets span that whole range.
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def get(self, *label_values):
+        with self.lock:
+            return self.values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for label_values, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(label_values)
+            if series is None:
+                series = self.values[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        with self.lock:
+            for label_values, series in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(names, label_values + (bound,))} {cumulative}")
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {series[-1]}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose samples are read from ``func`` at scrape time.
+
+    ``func`` returns a number, or a dict of label-value tuples to numbers.
+    """
+
+    def __init__(self, name, help, func, labels=()):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.labels = tuple(labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        samples = self.func()
+        if not isinstance(samples, dict):
+            samples = {(): samples}
+        for label_values, value in sorted(samples.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        """Add ``metric``, replacing any earlier one with the same name."""
+        with self.lock:
+            self.metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "transcript_stage_duration_seconds",
+    "Time spent in each pipeline stage.",
+    labels=("stage", "host", "outcome"),
+))
+STAGE_TOTAL = REGISTRY.register(Counter(
+    "transcript_stage_total",
+    "Pipeline stage runs.",
+    labels=("stage", "host", "outcome"),
+))
+WHISPER_RTF = REGISTRY.register(Histogram(
+    "transcript_whisper_real_time_factor",
+    "Whisper wall-clock time divided by audio duration.",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 4),
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "transcript_cache_requests_total",
+    "Transcript cache lookups, one per request.",
+    labels=("result",),
+))
+
+
+
+def _cache_hit_ratio():
+    hits, misses = CACHE_REQUESTS.get("hit"), CACHE_REQUESTS.get("miss")
+    return hits / (hits + misses) if hits + misses else 0
+
+
+REGISTRY.register(Gauge(
+    "transcript_cache_hit_ratio",
+    "Fraction of cache lookups served from the cache since start-up.",
+    _cache_hit_ratio,
+))
+
+
+def source_host(url):
+    return (urlparse(url).hostname or "unknown").lower()
+
+
+class _Stage:
+    def __init__(self):
+        self.outcome = "ok"
+
+
+@contextmanager
+def track_stage(stage, url):
+    """Time a pipeline stage and record it under the source host of ``url``.
+
+    The outcome is ``ok`` unless the block raises or sets
+    ``stage.outcome`` (e.g. to ``"error"`` for a failed lookup that the
+    stage reports by return value rather than by raising).
+    """
+    tracked = _Stage()
+    start = time.perf_counter()
+    try:
+        yield tracked
+    except (subprocess.TimeoutExpired, requests.Timeout, TimeoutError):
+        tracked.outcome = "timeout"
+        raise
+    except BaseException:
+        tracked.outcome = "error"
+        raise
+    finally:
+        record_stage(stage, url, time.perf_counter() - start, tracked.outcome)
+
+
+def record_stage(stage, url, seconds, outcome="ok"):
+    """Record a stage that was timed elsewhere, e.g. in the Whisper server."""
+    host = source_host(url)
+    STAGE_SECONDS.observe(seconds, stage, host, outcome)
+    STAGE_TOTAL.inc(stage, host, outcome)
+
+
+def render():
+    return REGISTRY.render()
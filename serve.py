@@ -0,0 +1,50 @@
+"""Production entry point: runs the app under gunicorn's threaded workers.
+
+    python serve.py                       # 1 process x 16 threads on :5000
+    WEB_WORKERS=2 WEB_THREADS=32 python serve.py
+"""
+import os
+import multiprocessing
+
+from gunicorn.app.base import BaseApplication
+
+from app import create_app
+
+
+def launcher_options():
+    return {
+        "bind": os.environ.get("BIND", "0.0.0.0:5000"),
+        # Each worker process builds its own app, so the cache, single-flight
+        # table and job store are shared by that worker's threads only. Keep
+        # one process unless jobs are routed stickily; Whisper runs in child
+        # processes so threads are enough to keep the CPUs busy.
+        "workers": int(os.environ.get("WEB_WORKERS", 1)),
+        "threads": int(os.environ.get("WEB_THREADS", 16)),
+        "worker_class": "gthread",
+        "keepalive": int(os.environ.get("WEB_KEEPALIVE", 5)),
+        "timeout": int(os.environ.get("WEB_TIMEOUT", 120)),
+        "graceful_timeout": int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 30)),
+        "max_requests": int(os.environ.get("WEB_MAX_REQUESTS", 0)),
+        "accesslog": "-",
+    }
+
+
+class TranscriptServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # Built inside each worker after the fork, never in the master, so no
+        # thread pools or SQLite handles are inherited across processes.
+        return create_app()
+
+
+if __name__ == "__main__":
+    options = launcher_options()
+    options["workers"] = min(options["workers"], multiprocessing.cpu_count())
+    TranscriptServer(options).run()
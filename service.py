@@ -0,0 +1,307 @@
+import os
+import queue
+import threading
+import uuid
+import concurrent.futures
+
+from transcript import (
+    BASE_DIR, CAPTION_METHODS, Deadline, extract_subtitles, extract_with_whisper, get_time_range, slice_result,
+)
+from jobs import AdmissionGate, BatchRunner, JobManager, QueueFull
+from cache import SingleFlight, TranscriptCache, canonical_media_id
+from metrics import REGISTRY, Gauge
+from whisper_server import choose_model
+
+
+def default_config():
+    """Service settings, overridable through the environment."""
+    return {
+        "TRANSCRIPT_CACHE_PATH": os.environ.get("TRANSCRIPT_CACHE_PATH", os.path.join(BASE_DIR, "transcript_cache.sqlite3")),
+        "TRANSCRIPT_CACHE_MB": int(os.environ.get("TRANSCRIPT_CACHE_MB", 256)),
+        "TRANSCRIPT_WORKERS": int(os.environ.get("TRANSCRIPT_WORKERS", 4)),
+        "TRANSCRIPT_JOB_QUEUE": int(os.environ.get("TRANSCRIPT_JOB_QUEUE", 64)),
+        "BATCH_SUBTITLE_WORKERS": int(os.environ.get("BATCH_SUBTITLE_WORKERS", 8)),
+        "BATCH_WHISPER_WORKERS": int(os.environ.get("BATCH_WHISPER_WORKERS", 1)),
+        # Long recordings take turns inside the Whisper server anyway; more
+        # runs at once lets short clips from different requests share batches
+        "WHISPER_CONCURRENCY": int(os.environ.get("WHISPER_CONCURRENCY", 4)),
+        "WHISPER_QUEUE": int(os.environ.get("WHISPER_QUEUE", 8)),
+    }
+
+
+class WhisperBusy(Exception):
+    """Raised instead of queueing when the caller asked not to wait for Whisper."""
+
+
+# Per-request options that change what the caption steps return
+RANGE_OPTIONS = ("start", "end")
+
+
+def variant_key(key, options=None):
+    """``key`` extended with the per-request ``options`` that shape the result."""
+    if not options:
+        return key
+    return key + "#" + "&".join(f"{name}={value}" for name, value in sorted(options.items()))
+
+
+def whisper_key(key, options=None, model=None):
+    """Cache key for a Whisper result of ``model``.
+
+    Whisper results never share a key with caption results, and explicit
+    per-request settings (engine, words, ...) get their own entry. ``model``
+    defaults to the one the request runs without a deadline, so a run sized
+    down to fit a deadline is never served to requests that have none.
+    """
+    options = dict(options or {})
+    options["model"] = model or choose_model(quality=options.get("quality"))
+    return variant_key("whisper:" + key, options)
+
+
+def whisper_flight_key(key, options, deadline):
+    """Single-flight key for a Whisper run; runs sized to a deadline only join each other."""
+    return whisper_key(key, options, None if deadline.remaining() is None else "auto")
+
+
+def subtitles_key(key, options=None):
+    """Cache key for a caption result; only the time range matters."""
+    return variant_key(key, {name: options[name] for name in RANGE_OPTIONS if name in (options or {})})
+
+
+class TranscriptService:
+    """Warm, process-wide state shared by every request thread.
+
+    Holds the transcript cache, the single-flight table, the Whisper admission
+    gate and the background pools, and wraps the pipeline so all entry points
+    go through them.
+    """
+
+    def __init__(self, config):
+        self.cache = TranscriptCache(
+            config["TRANSCRIPT_CACHE_PATH"],
+            max_bytes=config["TRANSCRIPT_CACHE_MB"] * 1024 * 1024,
+        )
+        self.in_flight = SingleFlight()
+        self.whisper_gate = AdmissionGate(config["WHISPER_CONCURRENCY"], config["WHISPER_QUEUE"])
+        self.jobs = JobManager(
+            self.fetch_transcript,
+            max_workers=config["TRANSCRIPT_WORKERS"],
+            max_queued=config["TRANSCRIPT_JOB_QUEUE"],
+        )
+        self.batches = BatchRunner(
+            self.fetch_subtitles,
+            self.fetch_whisper,
+            canonical_media_id,
+            first_workers=config["BATCH_SUBTITLE_WORKERS"],
+            fallback_workers=config["BATCH_WHISPER_WORKERS"],
+        )
+        self._register_gauges()
+
+    def _register_gauges(self):
+        REGISTRY.register(Gauge(
+            "transcript_whisper_runs",
+            "Whisper runs holding a slot (running) or queued for one (waiting).",
+            lambda: {(state,): n for state, n in self.whisper_gate.stats().items()},
+            labels=("state",),
+        ))
+        REGISTRY.register(Gauge(
+            "transcript_jobs",
+            "Background transcript jobs by status.",
+            lambda: {(status,): n for status, n in self.jobs.stats().items()},
+            labels=("status",),
+        ))
+        REGISTRY.register(Gauge(
+            "transcript_in_flight",
+            "Distinct pipeline computations currently running.",
+            lambda: len(self.in_flight),
+        ))
+
+    def fetch_transcript(self, url, timeout=None, ticket=None, wait_for_whisper=True, options=None):
+        """Return the transcript for ``url``, from the cache when possible.
+
+        ``timeout`` is the end-to-end deadline in seconds for this request and
+        ``ticket`` identifies it in the Whisper queue. With
+        ``wait_for_whisper=False``, raises ``WhisperBusy`` rather than queueing
+        when the captions fail and every Whisper slot is taken. ``options``
+        are per-request Whisper settings such as ``engine``.
+        """
+        key = canonical_media_id(url)
+        result = self._cached(key, options)
+        if result is not None:
+            return result
+
+        deadline = Deadline(timeout)
+        # A Whisper run in flight means the captions already failed for it
+        if whisper_flight_key(key, options, deadline) not in self.in_flight:
+            result = self._join_subtitles(url, key, deadline, options)
+            if "error" not in result:
+                return result
+
+            running = whisper_flight_key(key, options, deadline) in self.in_flight
+            if not wait_for_whisper and not running and self.whisper_gate.is_saturated():
+                raise WhisperBusy(result["error"])
+        return self._join_whisper(url, key, deadline, ticket, options)
+
+    def fetch_subtitles(self, url, timeout=None, ticket=None, options=None):
+        """Cheap half of ``fetch_transcript``: cache, then caption sources only."""
+        key = canonical_media_id(url)
+        result = self._cached(key, options)
+        if result is not None:
+            return result
+        return self._join_subtitles(url, key, Deadline(timeout), options)
+
+    def fetch_whisper(self, url, timeout=None, ticket=None, options=None):
+        """Expensive half of ``fetch_transcript``: Whisper only, behind the admission gate.
+
+        Only ever follows a lookup already counted in the cache metrics (a
+        batch's caption half, or the GET deferred to a job), so it isn't
+        counted again.
+        """
+        key = canonical_media_id(url)
+        result = self.cache.get(whisper_key(key, options), record=False)
+        if result is not None:
+            return result
+        return self._join_whisper(url, key, Deadline(timeout), ticket, options)
+
+    def _join_subtitles(self, url, key, deadline, options=None, on_segment=None):
+        def extract(url, on_segment, deadline):
+            return extract_subtitles(url, on_segment, deadline, options)
+
+        return self._join(subtitles_key(key, options), extract, url, deadline, on_segment)
+
+    def _join_whisper(self, url, key, deadline, ticket=None, options=None, on_segment=None):
+        def extract(url, on_segment, deadline):
+            # The run this request meant to join may have finished just before
+            result = self.cache.get(whisper_key(key, options), record=False)
+            if result is not None:
+                return result
+            return self._gated_whisper(url, on_segment, deadline, ticket, options)
+
+        def cache_key(result):
+            # Stored under the model that ran, whatever the deadline made of it
+            return whisper_key(key, options, result.get("model"))
+
+        return self._join(whisper_flight_key(key, options, deadline), extract, url, deadline, on_segment, cache_key)
+
+    def iter_events(self, url, timeout=None, options=None):
+        """Yield ``{"segment": ...}`` events as the pipeline produces text.
+
+        The last event is either ``{"done": true, "method": ...}`` or
+        ``{"error": ...}``. The pipeline keeps running (and fills the cache)
+        even if the client goes away. Streams share the run of any identical
+        request in flight, streamed or not, and get its segments so far.
+        """
+        key = canonical_media_id(url)
+        result = self._cached(key, options)
+        if result is not None:
+            # Replayed like a live run sends them: one event per segment line
+            if "segments" in result:
+                lines = [line for _, _, text in result["segments"] for line in text.split("\n")]
+            else:
+                lines = result["transcript"].splitlines()
+            for line in lines:
+                if line.strip():
+                    yield {"segment": line}
+            yield {"done": True, "method": result.get("method", "unknown")}
+            return
+
+        events = queue.Queue()
+
+        def run():
+            on_segment = lambda text: events.put({"segment": text})
+            deadline = Deadline(timeout)
+            try:
+                result = None
+                if whisper_flight_key(key, options, deadline) not in self.in_flight:
+                    result = self._join_subtitles(url, key, deadline, options, on_segment)
+                if result is None or "error" in result:
+                    result = self._join_whisper(url, key, deadline, options=options, on_segment=on_segment)
+            except Exception as e:
+                result = {"error": str(e)}
+            if "error" in result:
+                events.put({"error": result["error"]})
+            else:
+                events.put({"done": True, "method": result.get("method", "unknown")})
+
+        threading.Thread(target=run, daemon=True).start()
+        while True:
+            event = events.get()
+            yield event
+            if "segment" not in event:
+                return
+
+    def _cached(self, key, options=None):
+        """Any cached transcript for the request: its captions, else its Whisper run.
+
+        Counts as one cache hit or miss however many keys it probes.
+        """
+        result = self._cached_subtitles(key, options)
+        if result is None:
+            result = self.cache.get(whisper_key(key, options), record=False)
+        self.cache.record_lookup(result is not None)
+        return result
+
+    def _cached_subtitles(self, key, options=None):
+        """Cached caption result for ``options``, cut from the full transcript if need be."""
+        ranged_key = subtitles_key(key, options)
+        result = self._caption_entry(ranged_key)
+        if result is None and ranged_key != key:
+            full = self._caption_entry(key)
+            result = full and slice_result(full, get_time_range(options))
+            if result is not None:
+                self.cache.set(ranged_key, result)
+        return result
+
+    def _caption_entry(self, key):
+        result = self.cache.get(key, record=False)
+        # Whisper results used to share caption keys; never hand one of those
+        # to a request whose Whisper settings (words, engine, ...) may differ
+        if result is not None and result.get("method") not in CAPTION_METHODS:
+            return None
+        return result
+
+    def queue_whisper(self, url, timeout=None, options=None):
+        """Submit a background Whisper job that takes its place in line right away.
+
+        The Whisper queue counts the job from the moment it is submitted, not
+        from when a job thread picks it up. Raises ``QueueFull`` when that
+        queue or the job backlog is full.
+        """
+        ticket = uuid.uuid4().hex
+        self.whisper_gate.reserve(ticket)
+        try:
+            return self.jobs.submit(url, timeout, func=self._reserved_whisper, options=options, job_id=ticket)
+        except QueueFull:
+            self.whisper_gate.release(ticket)
+            raise
+
+    def _reserved_whisper(self, url, timeout=None, ticket=None, options=None):
+        try:
+            return self.fetch_whisper(url, timeout, ticket, options)
+        finally:
+            # The run never took its slot if it joined an identical run or hit the cache
+            self.whisper_gate.release(ticket)
+
+    def _gated_whisper(self, url, on_segment, deadline, ticket=None, options=None):
+        try:
+            with self.whisper_gate.slot(ticket, timeout=deadline.remaining()):
+                return extract_with_whisper(url, on_segment, deadline, options)
+        except QueueFull as e:
+            return {"error": str(e), "retry_after": e.retry_after}
+        except TimeoutError:
+            return {"error": "Transcript deadline exceeded while queued for Whisper"}
+
+    def _join(self, key, extract, url, deadline, on_segment=None, cache_key=None):
+        # Identical requests that arrive while this one runs share its result
+        try:
+            return self.in_flight.do(
+                key, self._compute, key, extract, url, deadline,
+                wait_timeout=deadline.remaining(), on_segment=on_segment, cache_key=cache_key,
+            )
+        except concurrent.futures.TimeoutError:
+            return {"error": "Transcript deadline exceeded while waiting for an identical request"}
+
+    def _compute(self, key, extract, url, deadline, on_segment=None, cache_key=None):
+        result = extract(url, on_segment, deadline)
+        if "error" not in result:
+            self.cache.set(cache_key(result) if cache_key else key, result)
+        return result
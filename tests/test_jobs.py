@@ -0,0 +1,51 @@
+import threading
+import time
+
+from jobs import AdmissionGate
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_reserved_ticket_keeps_its_place_without_blocking_waiters():
+    gate = AdmissionGate(max_running=1, max_waiting=4)
+    holder = gate.slot("holder")
+    holder.__enter__()
+    gate.reserve("job")
+
+    got_slot = threading.Event()
+    done = threading.Event()
+
+    def live():
+        with gate.slot("live", timeout=5):
+            got_slot.set()
+            done.wait(5)
+
+    thread = threading.Thread(target=live)
+    thread.start()
+    wait_until(lambda: gate.position("live") == 2)
+    assert gate.position("job") == 1
+
+    # The job that reserved first has no thread waiting yet, so the slot
+    # goes to the waiter behind it, and the job stays at the head
+    holder.__exit__(None, None, None)
+    assert got_slot.wait(5)
+    assert gate.position("job") == 1
+
+    gate.release("job")
+    assert gate.position("job") is None
+    assert gate.stats() == {"running": 1, "waiting": 0}
+    done.set()
+    thread.join()
+
+
+def test_released_reservation_frees_its_place():
+    gate = AdmissionGate(max_running=1, max_waiting=1)
+    gate.reserve("job")
+    gate.release("job")
+    gate.reserve("next")
+    assert gate.position("next") == 1
@@ -0,0 +1,77 @@
+import contextlib
+from concurrent.futures import Future
+
+import numpy as np
+
+import whisper_server
+from audio import SAMPLE_RATE
+
+
+class FakePool:
+    """Runs nothing; every chunk decodes to one segment at its start."""
+
+    def __init__(self):
+        self.chunks = 0
+
+    def submit(self, func, samples, word_timestamps=False):
+        self.chunks += 1
+        future = Future()
+        future.set_result([{"start": 0.0, "end": 1.0, "text": f"chunk {self.chunks}"}])
+        return future
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.shut_down = False
+
+    def shutdown(self, wait=True):
+        self.shut_down = True
+
+
+class FakeConn:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+    def poll(self):
+        return False
+
+
+def test_section_segments_are_on_the_recording_timeline(monkeypatch):
+    noise = np.random.default_rng(0).uniform(-0.5, 0.5, 400 * SAMPLE_RATE).astype(np.float32)
+    monkeypatch.setattr(whisper_server, "load_audio", lambda path: noise)
+    monkeypatch.setattr(whisper_server, "VAD_ENABLED", False)
+    monkeypatch.setattr(whisper_server, "BATCH_SIZE", 1)
+    server = whisper_server.WhisperServer(workers=2)
+    pool = FakePool()
+    monkeypatch.setattr(server, "pool", lambda engine, name, compute_type: contextlib.nullcontext(pool))
+    conn = FakeConn()
+
+    server._transcribe(conn, {"audio": "meeting.wav", "start": 100, "end": 300})
+
+    result = conn.sent[-1]
+    assert pool.chunks > 1
+    assert result["segments"]
+    for start, end, text in result["segments"]:
+        assert 100 <= start < end <= 300
+
+
+def test_idle_pools_past_the_cap_are_shut_down(monkeypatch):
+    server = whisper_server.WhisperServer(workers=1, max_pools=2)
+    monkeypatch.setattr(server, "_start_pool", lambda key: FakeExecutor())
+    server.pinned.add(("whisper", "base", "default"))
+    with server.pool("whisper", "base", "default") as base:
+        pass
+    with server.pool("whisper", "tiny", "default") as tiny:
+        with server.pool("whisper", "small", "default") as small:
+            # Both are in use, so the cap waits until one is idle
+            assert not tiny.shut_down and not small.shut_down
+        assert small.shut_down
+
+    with server.pool("whisper", "medium", "default"):
+        pass
+    assert tiny.shut_down
+    assert not base.shut_down
+    assert list(server.pools) == [("whisper", "base", "default"), ("whisper", "medium", "default")]
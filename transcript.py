@@ -2,6 +2,8 @@ import requests
 import subprocess
 import os
 import re
+import signal
+import time
 import uuid
 import sys
 import json
@@ -10,6 +12,11 @@ from youtube_transcript_api import YouTubeTranscriptApi
 from urllib.parse import urlparse, parse_qs
 from youtube_transcript_api.formatters import TextFormatter
 
+import whisper_server
+from captions import Cue, cues_to_text, in_time_range, iter_text_lines, parse_vtt
+from metrics import WHISPER_RTF, record_stage, track_stage
+from whisper_server import choose_model
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 #changes reflecteddddddddddd************************************
 # Set up logging to file
@@ -21,6 +28,76 @@ logging.basicConfig(
     format='%(asctime)s [%(levelname)s] %(message)s'
 )
 
+# Upper bound in seconds for each stage; the request deadline can cut it shorter
+STAGE_TIMEOUTS = {
+    "youtube_transcript_api": 15,
+    "yt-dlp subtitles": 60,
+    "html scan": 15,
+    "vtt download": 30,
+    "metadata": 60,
+    "audio download": 15 * 60,
+    "whisper": 2 * 60 * 60,
+}
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+class Deadline:
+    """End-to-end time budget for one request, shared by every stage."""
+
+    def __init__(self, seconds=None):
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self):
+        """Seconds left, or None when there is no deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def budget(self, stage):
+        """Seconds ``stage`` may run for; raises if the request is out of time."""
+        limit = STAGE_TIMEOUTS[stage]
+        if self.expires_at is not None:
+            remaining = self.expires_at - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Transcript deadline exceeded before {stage}")
+            limit = min(limit, remaining)
+        return limit
+
+class _TimeoutSession(requests.Session):
+    """requests session that applies a default timeout to every call."""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(*args, **kwargs)
+
+def _kill_process_group(process):
+    # yt-dlp and Whisper start ffmpeg children, so kill the whole group
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+def run_command(args, timeout, **kwargs):
+    """Like ``subprocess.run(check=True)``, but kills the whole process tree on timeout."""
+    with subprocess.Popen(args, start_new_session=True, **kwargs) as process:
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _kill_process_group(process)
+            process.communicate()
+            raise
+        except BaseException:
+            _kill_process_group(process)
+            raise
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, args, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
 def get_video_id(url):
     if "youtu.be" in url:
         return url.split("/")[-1]
@@ -59,219 +136,381 @@ def get_transcript_youtube_api(url):
         print(f"[youtube_transcript_api] Failed: {e}")
         return None
 
-def format_transcript(raw_text):
-    lines = raw_text.splitlines()
-    cleaned = []
+# Direct VTT downloads are read and parsed this many bytes at a time
+VTT_CHUNK_BYTES = 64 * 1024
 
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
+# Caption sources, whose results carry their cues as ``segments``
+CAPTION_METHODS = ("youtube_transcript_api", "yt-dlp subtitles", "html vtt")
 
-        line = re.sub(r'^>>\s*', '', line)
-        line = re.sub(r'\s*>>\s*', ' ', line)
-        line = re.sub(r':\s*\.', ':', line)
-        line = re.sub(r'\.\.+', '.', line)
-        line = re.sub(r'\s{2,}', ' ', line)
-        line = re.sub(r'\s*:\s*$', '', line)
-        line = re.sub(r'\s*–\s*', '-', line)
-        line = re.sub(r'\s+', ' ', line)
-
-        if line:
-            line = line[0].upper() + line[1:] if not line.isupper() else line
-            cleaned.append(line)
+def get_time_range(options):
+    """``(start, end)`` seconds requested in ``options``, or None for everything."""
+    options = options or {}
+    if options.get("start") is None and options.get("end") is None:
+        return None
+    return options.get("start"), options.get("end")
 
-    return "\n\n".join(cleaned)
+def clean_vtt_lines(lines, on_segment=None, time_range=None):
+    """Parse VTT ``lines`` into the JSON result of the caption steps."""
+    cues = parse_vtt(lines, on_segment, time_range)
+    cleaned_text = cues_to_text(cues)
 
-def clean_vtt_to_text(vtt_file):
-    text_lines = []
-    try:
-        with open(vtt_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line or '-->' in line:
-                    continue
+    output_dir = os.path.join(os.path.expanduser("~"), "Desktop", "transcript_output")
+    os.makedirs(output_dir, exist_ok=True)
 
-                line = re.sub(r'<\d{2}:\d{2}:\d{2}\.\d{3}>', '', line)
-                line = re.sub(r'</?[a-zA-Z0-9]>', '', line)
-                line = re.sub(r'\[\s*&nbsp;.*?&nbsp;\s*\]', '', line, flags=re.IGNORECASE)
-                if re.match(r'^\[\s*\]$', line):
-                    continue
+    output_file_path = os.path.join(output_dir, "clean_transcript.txt")
+    with open(output_file_path, "w", encoding='utf-8') as out:
+        out.write(cleaned_text)
 
-                text_lines.append(line)
+    return json.dumps({"text": cleaned_text, "segments": [cue.as_list() for cue in cues]})
 
+def clean_vtt_to_text(vtt_file, on_segment=None, time_range=None):
+    try:
+        with open(vtt_file, 'r', encoding='utf-8') as f:
+            output = clean_vtt_lines(f, on_segment, time_range)
         os.remove(vtt_file)
-        raw_text = "\n".join(text_lines)
-        cleaned_text = format_transcript(raw_text)
-
-        output_dir = os.path.join(os.path.expanduser("~"), "Desktop", "transcript_output")
-        os.makedirs(output_dir, exist_ok=True)
-
-        output_file_path = os.path.join(output_dir, "clean_transcript.txt")
-        with open(output_file_path, "w", encoding='utf-8') as out:
-            out.write(cleaned_text)
-
-        return cleaned_text
+        return output
 
     except Exception as e:
         return json.dumps({"error": f"Failed to clean VTT: {e}"})
 
-def run_whisper_transcription(file_path):
-    whisper_model = "base"
-    whisper_script = f"""
-import whisper, json
-model = whisper.load_model("{whisper_model}")
-result = model.transcribe("{file_path}")
-print(json.dumps({{"text": result['text']}}))
-"""
-    temp_script_path = "temp_whisper_script.py"
-    with open(temp_script_path, "w") as f:
-        f.write(whisper_script)
-
+def run_whisper_transcription(source, on_segment=None, timeout=None, download_timeout=None, options=None):
+    """Transcribe ``source`` (a media URL or audio file) on the warm Whisper server.
+
+    ``options`` may pick the ``model``, ``engine`` and ``compute_type``, ask
+    for ``words`` (word-level timestamps) and limit the run to the ``start``
+    to ``end`` section; anything left out uses the deployment defaults.
+    """
+    options = options or {}
+    result = whisper_server.transcribe(
+        source, options.get("model"), on_segment, timeout, download_timeout,
+        engine=options.get("engine"), compute_type=options.get("compute_type"),
+        word_timestamps=bool(options.get("words")),
+        start=options.get("start"), end=options.get("end"),
+    )
+    logging.info(
+        f"Whisper ({result['engine']} {result['model']}, {result['compute_type']}) transcribed "
+        f"{result['duration']:.0f}s of audio in {result['chunks']} chunks "
+        f"(real-time factor {result['rtf']:.2f})"
+    )
+    WHISPER_RTF.observe(result["rtf"])
+    return json.dumps(result)
+
+def probe_duration(url, deadline):
+    """Media duration in seconds from yt-dlp's metadata, or None if unknown."""
     try:
-        result = subprocess.run(["python3", temp_script_path], check=True, capture_output=True, text=True)
-        return result.stdout
-    finally:
-        os.remove(temp_script_path)
+        with track_stage("metadata", url):
+            result = run_command([
+                "yt-dlp",
+                "--cookies", "youtube.com_cookies.txt",
+                "--no-playlist",
+                "--skip-download",
+                "--print", "duration",
+                url
+            ], timeout=deadline.budget("metadata"), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        return float(result.stdout.split()[-1])
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, ValueError, IndexError) as e:
+        # Live streams and some hosts report "NA"; fall back to the default model
+        logging.warning(f"Could not read media duration for {url}: {e}")
+        return None
 
-def transcribe_with_whisper_audio(video_url):
-    #print("PYTHON OUTPUT: [downloading audio]...")
-    uid = str(uuid.uuid4())
-    output_path = f"transcribed_audio_{uid}.mp3"
+def select_model(url, deadline, options):
+    """Model for this run: explicit, or sized to the deadline and ``quality`` hint."""
+    if options.get("model"):
+        return options["model"]
+    quality = options.get("quality")
+    if quality is None and deadline.remaining() is None:
+        # Nothing to trade off, so skip the metadata lookup
+        return choose_model()
+
+    duration = probe_duration(url, deadline)
+    if duration is not None and get_time_range(options):
+        # Only the requested section is downloaded and decoded
+        start, end = get_time_range(options)
+        duration = max(0.0, min(duration, end if end is not None else duration) - (start or 0))
+    budget = deadline.budget("whisper")
+    model = choose_model(duration, budget, quality, options.get("engine"))
+    logging.info(f"Picked Whisper model {model} for {duration}s of audio, {budget:.0f}s budget, quality {quality}")
+    return model
+
+def transcribe_with_whisper_audio(video_url, on_segment=None, deadline=None, options=None):
+    deadline = deadline or Deadline()
+    options = dict(options or {})
+    options["model"] = select_model(video_url, deadline, options)
+    # The Whisper server pulls the audio from yt-dlp and decodes it straight
+    # to 16 kHz PCM, so there is no mp3 on disk and no second decode
+    download_timeout = deadline.budget("audio download")
+    timeout = download_timeout + deadline.budget("whisper")
+    if deadline.remaining() is not None:
+        timeout = min(timeout, deadline.remaining())
+    started = time.perf_counter()
 
     try:
-        subprocess.run([
-            "yt-dlp",
-            "--cookies", "youtube.com_cookies.txt",
-            "-f", "bestaudio",
-            "--extract-audio",
-            "--audio-format", "mp3",
-            "--no-playlist",
-            "-o", output_path,
-            video_url
-        ], check=True)
-        return run_whisper_transcription(output_path)
-
-    except subprocess.CalledProcessError:
-        return json.dumps({"error": "yt-dlp audio extraction failed and no fallback media extractor is defined."})
-
-    finally:
-        if os.path.exists(output_path):
-            os.remove(output_path)
-
-def download_subtitles(url):
+        result = json.loads(run_whisper_transcription(video_url, on_segment, timeout, download_timeout, options))
+        for stage, seconds in result.pop("timings", {}).items():
+            record_stage(stage, video_url, seconds)
+        return json.dumps(result)
+
+    except subprocess.TimeoutExpired as e:
+        record_stage("whisper", video_url, time.perf_counter() - started, "timeout")
+        return json.dumps({"error": f"Audio transcription timed out after {e.timeout:.0f}s"})
+
+    except ValueError as e:
+        return json.dumps({"error": str(e)})
+
+    except RuntimeError as e:
+        record_stage("whisper", video_url, time.perf_counter() - started, "error")
+        if "yt-dlp audio extraction failed" in str(e):
+            logging.error(str(e))
+            return json.dumps({"error": "yt-dlp audio extraction failed and no fallback media extractor is defined."})
+        return json.dumps({"error": str(e)})
+
+def download_subtitles(url, on_segment=None, deadline=None, time_range=None):
+    deadline = deadline or Deadline()
     if url.endswith(".vtt"):
-        return download_vtt_and_process(url)
+        return download_vtt_and_process(url, on_segment, deadline, time_range)
 
     uid = str(uuid.uuid4())
     vtt_filename = f"{uid}.en.vtt"
     output_path = os.path.join(BASE_DIR, vtt_filename)
 
     try:
-        result = subprocess.run(
-            [
-                "yt-dlp",
-                "--cookies", "youtube.com_cookies.txt",
-                "--write-sub",
-                "--write-auto-sub",
-                "--sub-lang", "en",
-                "--skip-download",
-                "-o", os.path.join(BASE_DIR, uid),
-                url
-            ],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
+        with track_stage("yt-dlp subtitles", url) as stage:
+            result = run_command(
+                [
+                    "yt-dlp",
+                    "--cookies", "youtube.com_cookies.txt",
+                    "--write-sub",
+                    "--write-auto-sub",
+                    "--sub-lang", "en",
+                    "--skip-download",
+                    "-o", os.path.join(BASE_DIR, uid),
+                    url
+                ],
+                timeout=deadline.budget("yt-dlp subtitles"),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+            if not os.path.exists(output_path):
+                stage.outcome = "not_found"
 
         if os.path.exists(output_path):
-            return clean_vtt_to_text(output_path)
+            return _clean_vtt_tracked(output_path, url, on_segment, time_range)
         else:
             logging.warning(f"yt-dlp ran, but .vtt file not found at: {output_path}")
             return json.dumps({"error": "Subtitles not found."})
 
+    except subprocess.TimeoutExpired as e:
+        return json.dumps({"error": f"yt-dlp subtitles timed out after {e.timeout:.0f}s"})
+
     except subprocess.CalledProcessError as e:
         return json.dumps({"error": f"yt-dlp failed: {e.stderr.decode('utf-8')}"})
 
-def download_vtt_and_process(vtt_url):
+def _before_deadline(chunks, deadline):
+    # The read timeout only bounds each chunk; a slow body must not outlive the request
+    for chunk in chunks:
+        if deadline.remaining() == 0:
+            raise requests.Timeout("Transcript deadline exceeded while reading the VTT body")
+        yield chunk
+
+def download_vtt_and_process(vtt_url, on_segment=None, deadline=None, time_range=None):
+    deadline = deadline or Deadline()
     try:
         logging.info(f"Downloading direct VTT file: {vtt_url}")
-        vtt_response = requests.get(vtt_url, timeout=10)
-        if vtt_response.status_code != 200:
-            return json.dumps({"error": f"Failed to download VTT (HTTP {vtt_response.status_code})"})
-
-        temp_vtt_path = os.path.join(BASE_DIR, f"{str(uuid.uuid4())}.vtt")
-        with open(temp_vtt_path, "wb") as f:
-            f.write(vtt_response.content)
-
-        return clean_vtt_to_text(temp_vtt_path)
+        with track_stage("vtt download", vtt_url) as stage:
+            vtt_response = requests.get(vtt_url, timeout=deadline.budget("vtt download"), stream=True)
+            if vtt_response.status_code != 200:
+                vtt_response.close()
+                stage.outcome = "error"
+                return json.dumps({"error": f"Failed to download VTT (HTTP {vtt_response.status_code})"})
+
+        # The body is parsed as it arrives: no temp file, and only one chunk
+        # of it in memory however long the recording is
+        with vtt_response, track_stage("vtt cleaning", vtt_url):
+            vtt_response.encoding = "utf-8"
+            chunks = vtt_response.iter_content(VTT_CHUNK_BYTES, decode_unicode=True)
+            return clean_vtt_lines(iter_text_lines(_before_deadline(chunks, deadline)), on_segment, time_range)
+
+    except DeadlineExceeded:
+        raise
+
+    except requests.Timeout:
+        return json.dumps({"error": "VTT download timed out"})
 
     except Exception as e:
         return json.dumps({"error": f"Exception while downloading VTT: {e}"})
 
-def extract_vtt_from_html_page(url):
+def extract_vtt_from_html_page(url, deadline=None):
+    with track_stage("html scan", url) as stage:
+        vtt_url = _scan_html_for_vtt(url, deadline or Deadline())
+        if not vtt_url:
+            stage.outcome = "not_found"
+        return vtt_url
+
+def _scan_html_for_vtt(url, deadline):
     try:
         logging.info(f"Scanning HTML source for VTT: {url}")
-        response = requests.get(url, timeout=10)
+        response = requests.get(url, timeout=min(10, deadline.budget("html scan")))
         vtt_matches = re.findall(r'https?://[^\s\'"]+\.vtt', response.text)
         if vtt_matches:
             full_vtt_url = vtt_matches[0]
             logging.info(f"Found VTT in HTML: {full_vtt_url}")
 
-            head_resp = requests.head(full_vtt_url, timeout=5)
+            head_resp = requests.head(full_vtt_url, timeout=min(5, deadline.budget("html scan")))
             if head_resp.status_code == 200:
                 return full_vtt_url
             else:
                 logging.warning(f"VTT exists but not downloadable (HTTP {head_resp.status_code})")
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logging.error(f"HTML scan failed: {e}")
     return None
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print(json.dumps({"error": "URL missing"}))
-        sys.exit(1)
+def _clean_vtt_tracked(vtt_file, source_url, on_segment, time_range=None):
+    with track_stage("vtt cleaning", source_url) as stage:
+        output = clean_vtt_to_text(vtt_file, on_segment, time_range)
+        if output.startswith('{"error"'):
+            stage.outcome = "error"
+        return output
+
+def _as_result(output, method):
+    """Normalize the string output of a pipeline step into a result dict."""
+    try:
+        parsed = json.loads(output)
+    except (TypeError, json.JSONDecodeError):
+        return {"method": method, "transcript": output}
+
+    if isinstance(parsed, dict):
+        if "error" in parsed:
+            return {"error": parsed["error"]}
+        if "text" in parsed:
+            result = {"method": method, "transcript": parsed["text"]}
+            # Keep stage details such as Whisper's duration and real-time factor
+            result.update((k, v) for k, v in parsed.items() if k != "text")
+            return result
+    elif isinstance(parsed, str):
+        return {"method": method, "transcript": parsed}
+    return {"method": method, "transcript": output}
+
+def slice_result(result, time_range):
+    """The part of a cached caption ``result`` inside ``time_range``, or None.
+
+    Caption results keep their cues as ``segments``, so a transcript for any
+    time range can be cut out of the full one instead of fetched again.
+    Whisper results are not sliced; a range there means decoding less audio.
+    """
+    method = result.get("method")
+    if method not in CAPTION_METHODS or "segments" not in result:
+        return None
+    cues = [Cue(*segment) for segment in result["segments"]]
+    cues = [cue for cue in cues if in_time_range(cue.start, cue.end, time_range)]
+    if method == "youtube_transcript_api":
+        # Same layout as TextFormatter: one snippet per line
+        text = "\n".join(cue.text for cue in cues)
+    else:
+        text = cues_to_text(cues)
+    return {"method": method, "transcript": text, "segments": [cue.as_list() for cue in cues]}
+
+def extract_transcript(url, on_segment=None, deadline=None, options=None):
+    """Run the fallback chain for ``url`` and return a result dict.
+
+    On success the dict holds ``method`` and ``transcript``; on failure it
+    holds a single ``error`` message. If ``on_segment`` is given it is called
+    with each piece of transcript text as soon as a stage produces it.
+    ``deadline`` bounds the whole chain; each stage also has its own cap.
+    ``options`` are passed on to Whisper (see ``extract_with_whisper``); their
+    ``start`` and ``end`` limit every step to that part of the recording.
+    """
+    deadline = deadline or Deadline()
+    result = extract_subtitles(url, on_segment, deadline, options)
+
+    # Step 3: Fallback to Whisper if still failed
+    if "error" in result:
+        result = extract_with_whisper(url, on_segment, deadline, options)
+
+    return result
+
+def extract_subtitles(url, on_segment=None, deadline=None, options=None):
+    """Run the cheap, caption-based steps of the chain only.
+
+    Only ``start`` and ``end`` in ``options`` matter here: cues outside that
+    range are dropped.
+    """
+    deadline = deadline or Deadline()
+    try:
+        return _extract_subtitles(url.strip(), on_segment, deadline, get_time_range(options))
+    except DeadlineExceeded as e:
+        logging.warning(str(e))
+        return {"error": str(e)}
 
-    url = sys.argv[1].strip()
+def _extract_subtitles(url, on_segment, deadline, time_range=None):
     logging.info(f"Starting transcript extraction for: {url}")
 
     # Step 1: Try YouTubeTranscriptApi first
     try:
         video_id = get_video_id(url)
-
-        ytt_api = YouTubeTranscriptApi()
-        fetched = ytt_api.fetch(video_id)
-        #transcript_data = YouTubeTranscriptApi.get_transcript(video_id)
+        if not video_id:
+            raise ValueError("not a YouTube URL")
+
+        with track_stage("youtube_transcript_api", url):
+            ytt_api = YouTubeTranscriptApi(http_client=_TimeoutSession(deadline.budget("youtube_transcript_api")))
+            fetched = ytt_api.fetch(video_id)
+        if time_range:
+            fetched.snippets = [
+                snippet for snippet in fetched
+                if in_time_range(snippet.start, snippet.start + snippet.duration, time_range)
+            ]
         formatter = TextFormatter()
         text = formatter.format_transcript(fetched)
-
-        #text = "\n\n".join([item["text"] for item in transcript_data])
-        print(json.dumps({"text": text})) 
-        sys.exit(0)
+        if on_segment:
+            for snippet in fetched:
+                on_segment(snippet.text)
+        segments = [
+            [round(snippet.start, 3), round(snippet.start + snippet.duration, 3), snippet.text]
+            for snippet in fetched
+        ]
+        return {"method": "youtube_transcript_api", "transcript": text, "segments": segments}
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logging.warning(f"YouTubeTranscriptApi failed: {e}")
 
     # Step 2: Try subtitles using yt-dlp
-    transcript = download_subtitles(url)
+    result = _as_result(download_subtitles(url, on_segment, deadline, time_range), "yt-dlp subtitles")
 
-    try:
-        parsed = json.loads(transcript)
-        if "error" in parsed:
-            logging.warning("Subtitles not found. Trying HTML page scan for .vtt...")
-            vtt_url = extract_vtt_from_html_page(url)
+    if "error" in result:
+        logging.warning("Subtitles not found. Trying HTML page scan for .vtt...")
+        vtt_url = extract_vtt_from_html_page(url, deadline)
 
-            if vtt_url:
-                logging.info(f"Retrying with direct VTT URL: {vtt_url}")
-                transcript = download_vtt_and_process(vtt_url)
-                parsed = json.loads(transcript)
+        if vtt_url:
+            logging.info(f"Retrying with direct VTT URL: {vtt_url}")
+            result = _as_result(download_vtt_and_process(vtt_url, on_segment, deadline, time_range), "html vtt")
 
-        # Step 3: Fallback to Whisper if still failed
-        if "error" in parsed:
-            logging.warning("Falling back to Whisper (audio transcription)...")
-            transcript = transcribe_with_whisper_audio(url)
+    return result
+
+def extract_with_whisper(url, on_segment=None, deadline=None, options=None):
+    """Transcribe the audio of ``url`` with Whisper, the expensive last resort.
 
-        print(transcript)
+    ``options`` holds per-request settings such as ``engine``,
+    ``compute_type``, ``words`` and the ``quality`` hint used to pick the
+    model. The model that ran is reported in ``method`` as ``whisper:<model>``.
+    """
+    deadline = deadline or Deadline()
+    logging.warning("Falling back to Whisper (audio transcription)...")
+    try:
+        result = _as_result(transcribe_with_whisper_audio(url.strip(), on_segment, deadline, options), "whisper")
+        if "model" in result:
+            result["method"] = f"whisper:{result['model']}"
+        return result
+    except DeadlineExceeded as e:
+        logging.warning(str(e))
+        return {"error": str(e)}
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(json.dumps({"error": "URL missing"}))
+        sys.exit(1)
 
-    except json.JSONDecodeError:
-        logging.error("Transcript output was not JSON — printing raw result.")
-        print(transcript)
+    result = extract_transcript(sys.argv[1])
+    print(json.dumps(result))
+    sys.exit(1 if "error" in result else 0)
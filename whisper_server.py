@@ -0,0 +1,738 @@
+"""Long-lived Whisper worker.
+
+Loads the Whisper models once, runs a warm-up inference and then serves
+transcription jobs over a local socket, so a request no longer pays for the
+interpreter start and model load on every call. Each recording is cut into
+chunks at silences and the chunks are decoded in parallel by a pool of
+worker processes, one warm model per worker. Short clips that arrive
+together are cut into 30 s windows instead, and windows from different jobs
+are decoded in shared batches (see ``WindowBatcher``). The ASR engine behind the
+models is pluggable (see ``engines``). Long recordings are checkpointed to
+scratch disk chunk by chunk (see ``checkpoints``), so a run that dies part
+way through resumes where it stopped.
+
+    python whisper_server.py
+
+``transcribe`` is the client side: it connects to the server, starting it on
+first use if nothing is listening, and relays segments as they are decoded.
+"""
+import collections
+import contextlib
+import functools
+import logging
+import multiprocessing
+import os
+import queue
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.connection import Client, Listener
+
+import checkpoints
+import engines
+from audio import (
+    SAMPLE_RATE, keep_regions, load_audio, original_time, speech_regions, split_on_silence, stream_pcm,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_ADDRESS = os.environ.get("WHISPER_SERVER_ADDRESS", os.path.join(BASE_DIR, "whisper.sock"))
+AUTHKEY = os.environ.get("WHISPER_SERVER_AUTHKEY", "transcriber").encode()
+DEFAULT_MODEL = os.environ.get("WHISPER_MODEL", "base")
+PRELOAD_MODELS = [m for m in os.environ.get("WHISPER_PRELOAD_MODELS", DEFAULT_MODEL).split(",") if m]
+# Models automatic selection may pick from, smallest first
+AUTO_MODELS = [m for m in os.environ.get("WHISPER_AUTO_MODELS", "tiny,base,small,medium").split(",") if m]
+# Rough real-time factors of the chunked server with openai-whisper on an
+# 8-core CPU. Override for your hardware, e.g. WHISPER_MODEL_RTF="tiny=0.03,small=0.2"
+MODEL_RTF = {"tiny": 0.04, "base": 0.08, "small": 0.25, "medium": 0.7, "large-v3": 1.6}
+MODEL_RTF.update(
+    (name, float(rtf))
+    for name, _, rtf in (pair.partition("=") for pair in os.environ.get("WHISPER_MODEL_RTF", "").split(",") if pair)
+)
+QUALITIES = ("fast", "balanced", "accurate")
+# Share of the time budget a model is expected to use; the rest absorbs the
+# download and estimation error
+BUDGET_SHARE = 0.7
+# Interpreter that has the ASR engines installed
+WHISPER_PYTHON = os.environ.get("WHISPER_PYTHON", "python3")
+# How long a client waits for a freshly started server to load its models
+SERVER_START_TIMEOUT = 300
+# How often a job waiting on its chunks checks whether its client gave up
+CLIENT_POLL_SECONDS = 0.5
+# Warm pools kept at once. Each holds a copy of its model per worker, so
+# pools started on demand (other models, engines or compute types) are shut
+# down least recently used first once idle; preloaded ones are always kept
+MAX_POOLS = int(os.environ.get("WHISPER_MAX_POOLS", 2))
+
+# Chunks are at most this long; shorter recordings are cut into one chunk
+# per worker so every core gets a share
+MAX_CHUNK_SECONDS = int(os.environ.get("WHISPER_CHUNK_SECONDS", 600))
+MIN_CHUNK_SECONDS = 60
+# Each chunk is decoded with this much extra audio on both sides, so a word
+# straddling a cut is heard whole by at least one chunk
+CHUNK_OVERLAP_SECONDS = 1.0
+CHUNK_WORKERS = int(os.environ.get("WHISPER_CHUNK_WORKERS", os.cpu_count() or 1))
+# Longest run of words treated as duplicated across a chunk boundary
+MAX_OVERLAP_WORDS = 8
+# Drop silence (dead air before the gavel, recesses) before decoding
+VAD_ENABLED = os.environ.get("WHISPER_VAD", "1") != "0"
+# Recordings at least this long are checkpointed to scratch disk
+CHECKPOINT_MIN_SECONDS = int(os.environ.get("WHISPER_CHECKPOINT_MIN_SECONDS", 10 * 60))
+# How often a client resubmits a job whose server or worker died
+RESUME_ATTEMPTS = 2
+# Clips with at most this much speech are decoded as 30 s windows batched
+# across concurrent jobs; WHISPER_BATCH_SIZE=1 turns batching off
+BATCH_CLIP_SECONDS = int(os.environ.get("WHISPER_BATCH_CLIP_SECONDS", 5 * 60))
+BATCH_SIZE = int(os.environ.get("WHISPER_BATCH_SIZE", 8))
+# How long a free worker waits for more windows before decoding a partial batch
+BATCH_WAIT_SECONDS = int(os.environ.get("WHISPER_BATCH_WAIT_MS", 50)) / 1000
+# Windows are cut near this length, so even the last one fits Whisper's 30 s input
+WINDOW_CUT_SECONDS = 20
+
+_worker_engine = None
+
+
+def _init_worker(engine, model_name, compute_type, threads):
+    """Process-pool initializer: load and warm one model per worker."""
+    global _worker_engine
+    import numpy as np
+
+    _configure_logging()
+    started = time.monotonic()
+    _worker_engine = engines.load_engine(engine, model_name, compute_type, threads)
+    # One tiny inference so the first real chunk doesn't pay for lazy init
+    _worker_engine.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32))
+    logging.info(
+        f"{engine} model {model_name} ({compute_type}) loaded and warmed up in {time.monotonic() - started:.1f}s"
+    )
+
+
+def _ping():
+    return os.getpid()
+
+
+def _transcribe_chunk(samples, word_timestamps=False):
+    return _worker_engine.transcribe(samples, word_timestamps)
+
+
+def _transcribe_batch(windows, word_timestamps=False):
+    return _worker_engine.transcribe_batch(windows, word_timestamps)
+
+
+def _save_chunk(checkpoint, index, future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        checkpoint.save_chunk(index, future.result())
+    except OSError as e:
+        logging.warning(f"Could not checkpoint chunk {index}: {e}")
+
+
+def _result(future, conn):
+    """``future.result()``, or ``EOFError`` as soon as the client has gone away."""
+    while not wait([future], timeout=CLIENT_POLL_SECONDS).done:
+        # A client never sends after its request, so readable means closed
+        if conn.poll():
+            raise EOFError("Whisper client went away")
+    return future.result()
+
+
+def chunk_seconds(duration, workers=CHUNK_WORKERS):
+    return max(MIN_CHUNK_SECONDS, min(MAX_CHUNK_SECONDS, duration / workers))
+
+
+def _normalize(word):
+    return word.strip(".,!?;:\"'").lower()
+
+
+def _overlap_words(tail, head):
+    """Length of the longest run that ends ``tail`` and starts ``head``."""
+    tail = [_normalize(w) for w in tail]
+    head = [_normalize(w) for w in head]
+    for n in range(min(len(tail), len(head)), 0, -1):
+        if tail[-n:] == head[:n]:
+            return n
+    return 0
+
+
+def _to_timeline(seg, offset, regions, base=0.0):
+    """Move a chunk-relative segment onto the original recording's timeline.
+
+    ``base`` is where the decoded audio starts in the recording, for
+    section downloads.
+    """
+    moved = dict(
+        seg,
+        start=base + original_time(seg["start"] + offset, regions),
+        end=base + original_time(seg["end"] + offset, regions),
+    )
+    if "words" in seg:
+        moved["words"] = [
+            [base + original_time(start + offset, regions), base + original_time(end + offset, regions), word]
+            for start, end, word in seg["words"]
+        ]
+    return moved
+
+
+def stitch(kept, segments):
+    """Return the part of ``segments`` not already covered by ``kept``.
+
+    Both lists are on the absolute timeline. Segments that end inside the
+    region already transcribed are dropped, and words repeated across the
+    boundary are trimmed from the first new segment.
+    """
+    if not kept:
+        return segments
+
+    last_end = kept[-1]["end"]
+    segments = [seg for seg in segments if seg["end"] > last_end + 0.1]
+    if segments:
+        words = segments[0]["text"].split()
+        repeated = _overlap_words(kept[-1]["text"].split()[-MAX_OVERLAP_WORDS:], words)
+        if repeated:
+            first = dict(segments[0], start=max(segments[0]["start"], last_end), text=" ".join(words[repeated:]))
+            if "words" in first:
+                first["words"] = first["words"][repeated:]
+            segments = ([first] if first["text"] else []) + segments[1:]
+    return segments
+
+
+class WindowBatcher:
+    """Decodes short audio windows from many jobs in shared batches.
+
+    Windows queue up until a pool worker is free. The batch then takes
+    everything waiting, up to ``max_size`` windows, lingering ``wait``
+    seconds for more if it is not full. Under load batches grow on their
+    own; when idle a lone window waits at most ``wait`` seconds.
+    """
+
+    def __init__(self, pool, workers, max_size=BATCH_SIZE, wait=BATCH_WAIT_SECONDS):
+        self.pool = pool
+        self.max_size = max_size
+        self.wait = wait
+        self.windows = queue.Queue()
+        self.free_workers = threading.Semaphore(workers)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, samples, word_timestamps=False):
+        """Queue one window; the future resolves to its segments."""
+        future = Future()
+        self.windows.put((samples, word_timestamps, future))
+        return future
+
+    def close(self):
+        """Stop batching once the windows already queued are decoded."""
+        self.windows.put(None)
+
+    def _run(self):
+        while True:
+            self.free_workers.acquire()
+            first = self.windows.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.wait
+            while len(batch) < self.max_size:
+                try:
+                    item = self.windows.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    # Closed: decode this batch, then stop at the next turn
+                    self.windows.put(None)
+                    break
+                batch.append(item)
+
+            # Skip windows whose job already gave up
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                self.free_workers.release()
+                continue
+            # One decode per batch; windows that didn't ask for word times just ignore them
+            word_timestamps = any(item[1] for item in batch)
+            try:
+                decoded = self.pool.submit(_transcribe_batch, [item[0] for item in batch], word_timestamps)
+            except Exception as e:
+                decoded = Future()
+                decoded.set_exception(e)
+            decoded.add_done_callback(functools.partial(self._route, batch))
+
+    def _route(self, batch, decoded):
+        self.free_workers.release()
+        try:
+            results = decoded.result()
+        except Exception as e:
+            for item in batch:
+                item[2].set_exception(e)
+        else:
+            for item, segments in zip(batch, results):
+                item[2].set_result(segments)
+
+
+class WhisperServer:
+    def __init__(self, address=SERVER_ADDRESS, preload=PRELOAD_MODELS, workers=CHUNK_WORKERS,
+                 max_pools=MAX_POOLS):
+        self.address = address
+        self.preload = preload
+        self.workers = workers
+        self.max_pools = max_pools
+        # Least recently used first
+        self.pools = collections.OrderedDict()
+        self.batchers = {}
+        # Jobs holding each pool, pools still loading, and the preloaded ones
+        self.users = collections.Counter()
+        self.loading = {}
+        self.pinned = set()
+        self.lock = threading.Lock()
+        # Long recordings run one at a time; their chunks already keep every core busy
+        self.long_jobs = threading.Semaphore(1)
+
+    @contextlib.contextmanager
+    def pool(self, engine, name, compute_type):
+        """Process pool whose workers each hold a warm copy of model ``name``.
+
+        The pool is kept for the duration of the ``with`` block; past
+        ``max_pools``, idle ones that were not preloaded are shut down.
+        """
+        key = (engine, name, compute_type)
+        pool = self._acquire(key)
+        try:
+            yield pool
+        finally:
+            with self.lock:
+                self.users[key] -= 1
+            self._evict()
+
+    def batcher(self, pool, engine, name, compute_type):
+        with self.lock:
+            key = (engine, name, compute_type)
+            if key not in self.batchers:
+                self.batchers[key] = WindowBatcher(pool, self.workers)
+            return self.batchers[key]
+
+    def _drop(self, key, pool):
+        with self.lock:
+            # A job that still held a broken pool must not drop its replacement
+            if self.pools.get(key) is not pool:
+                return
+            del self.pools[key]
+            batcher = self.batchers.pop(key, None)
+        if batcher:
+            batcher.close()
+
+    def _recycle(self, key, pool):
+        """Stop ``pool`` now, chunks running on it included; the next job starts a fresh one."""
+        logging.info(f"Stopping Whisper pool {key} to abandon its running chunks")
+        self._drop(key, pool)
+        # Running futures can't be cancelled, only their processes stopped
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _acquire(self, key):
+        while True:
+            with self.lock:
+                if key in self.pools:
+                    self.pools.move_to_end(key)
+                    self.users[key] += 1
+                    return self.pools[key]
+                loading = self.loading.get(key)
+                leader = loading is None
+                if leader:
+                    loading = self.loading[key] = Future()
+            if not leader:
+                # Another job is loading this model; jobs on other models go on meanwhile
+                loading.result()
+                continue
+
+            try:
+                pool = self._start_pool(key)
+            except BaseException as e:
+                with self.lock:
+                    del self.loading[key]
+                loading.set_exception(e)
+                raise
+            with self.lock:
+                del self.loading[key]
+                self.pools[key] = pool
+                self.users[key] += 1
+            loading.set_result(pool)
+            self._evict()
+            return pool
+
+    def _evict(self):
+        evicted = []
+        with self.lock:
+            for key in list(self.pools):
+                if len(self.pools) <= self.max_pools:
+                    break
+                if self.users[key] or key in self.pinned:
+                    continue
+                logging.info(f"Shutting down idle Whisper pool {key}")
+                evicted.append((self.pools.pop(key), self.batchers.pop(key, None)))
+                del self.users[key]
+        for pool, batcher in evicted:
+            if batcher:
+                batcher.close()
+            pool.shutdown(wait=False)
+
+    def _start_pool(self, key):
+        engine, name, compute_type = key
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(engine, name, compute_type, threads),
+        )
+        # Start every worker now so model load happens before the first job
+        try:
+            for future in [pool.submit(_ping) for _ in range(self.workers)]:
+                future.result()
+        except BrokenProcessPool:
+            pool.shutdown(wait=False)
+            raise RuntimeError(f"Could not load {engine} model {name} ({compute_type}), see the server log")
+        return pool
+
+    def serve_forever(self):
+        if _connect():
+            logging.info("Another Whisper server is already listening, exiting")
+            return
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            # Left behind by a server that died; nobody is listening on it
+            os.remove(self.address)
+
+        # Load before listening, so clients only connect once we are warm
+        engine, compute_type = engines.resolve()
+        for name in self.preload:
+            self.pinned.add((engine, name, compute_type))
+            with self.pool(engine, name, compute_type):
+                pass
+
+        with Listener(self.address, authkey=AUTHKEY) as listener:
+            logging.info(f"Whisper server listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logging.warning(f"Rejected Whisper client: {e}")
+                    continue
+                threading.Thread(target=self._receive, args=(conn,), daemon=True).start()
+
+    def _receive(self, conn):
+        # Jobs run concurrently so their downloads overlap and short clips
+        # can share batches; long recordings still take turns (long_jobs)
+        try:
+            request = conn.recv()
+        except EOFError:
+            conn.close()
+            return
+        try:
+            checkpoints.sweep()
+            self._transcribe(conn, request)
+        except (BrokenPipeError, ConnectionResetError, EOFError, InterruptedError):
+            logging.warning(f"Whisper client went away, abandoned {request.get('url') or request.get('audio')}")
+        except BrokenProcessPool as e:
+            # A worker died (e.g. out of memory); finished chunks are checkpointed
+            logging.error(f"Whisper worker died: {e}")
+            with contextlib.suppress(OSError):
+                conn.send({"error": f"Whisper worker died: {e}", "resumable": True})
+        except Exception as e:
+            logging.error(f"Whisper job failed: {e}")
+            with contextlib.suppress(OSError):
+                conn.send({"error": f"Whisper failed: {e}"})
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _pool_key(request):
+        engine, compute_type = engines.resolve(request.get("engine"), request.get("compute_type"))
+        return engine, request.get("model") or DEFAULT_MODEL, compute_type
+
+    def _transcribe(self, conn, request):
+        key = self._pool_key(request)
+        with self.pool(*key) as pool:
+            try:
+                self._transcribe_with(pool, conn, request, *key)
+            except BrokenProcessPool:
+                self._drop(key, pool)
+                raise
+
+    def _transcribe_with(self, pool, conn, request, engine, model, compute_type):
+        word_timestamps = bool(request.get("word_timestamps"))
+        start, end = request.get("start"), request.get("end")
+        checkpoint = checkpoints.Checkpoint([
+            request.get("url") or request.get("audio"), engine, model, compute_type, word_timestamps, VAD_ENABLED,
+            start, end,
+        ])
+
+        started = time.monotonic()
+        samples = checkpoint.load_audio()
+        resumed = samples is not None
+        if resumed:
+            logging.info(f"Resuming Whisper run from checkpoint {checkpoint.path}")
+        elif request.get("url"):
+            # A closed client connection polls as readable (EOF), so stop the download
+            samples = stream_pcm(
+                request["url"], timeout=request.get("download_timeout"), should_stop=conn.poll, start=start, end=end,
+            )
+        else:
+            samples = load_audio(request["audio"])
+            # Local files are decoded whole, so cut the section out here
+            first = int((start or 0) * SAMPLE_RATE)
+            samples = samples[first:None if end is None else int(end * SAMPLE_RATE)]
+        downloaded = time.monotonic()
+        duration = len(samples) / SAMPLE_RATE
+        checkpointed = resumed or duration >= CHECKPOINT_MIN_SECONDS
+
+        plan = checkpoint.load_plan() if resumed else None
+        batched = False
+        if plan:
+            # Reuse the saved cuts so saved chunks line up even if settings changed
+            regions, bounds = plan
+            samples = keep_regions(samples, regions)
+        else:
+            if checkpointed:
+                checkpoint.save_audio(samples)
+            # Whisper only hears the speech; its timestamps are mapped back below
+            regions = speech_regions(samples) if VAD_ENABLED else [(0, len(samples))]
+            samples = keep_regions(samples, regions)
+            speech = len(samples) / SAMPLE_RATE
+            batched = BATCH_SIZE > 1 and not checkpointed and 0 < speech <= BATCH_CLIP_SECONDS
+            bounds = []
+            if batched:
+                bounds = split_on_silence(samples, WINDOW_CUT_SECONDS, search_seconds=WINDOW_CUT_SECONDS / 4)
+            elif len(samples):
+                bounds = split_on_silence(samples, chunk_seconds(speech, self.workers))
+            if checkpointed:
+                checkpoint.save_plan(regions, bounds)
+        speech = len(samples) / SAMPLE_RATE
+
+        # Batched windows are cut at silences and fit Whisper's input whole, so
+        # they need no overlap; long chunks overlap and are stitched
+        overlap = 0 if batched else int(CHUNK_OVERLAP_SECONDS * SAMPLE_RATE)
+        batcher = self.batcher(pool, engine, model, compute_type) if batched else None
+        # Segments are mapped back onto the whole recording, not the section
+        section_start = start or 0.0
+        offsets, futures = [], []
+        reused = 0
+        with contextlib.nullcontext() if batched else self.long_jobs:
+            for index, (chunk_start, chunk_end) in enumerate(bounds):
+                chunk_start = max(0, chunk_start - overlap)
+                offsets.append(chunk_start / SAMPLE_RATE)
+                chunk = samples[chunk_start:min(len(samples), chunk_end + overlap)]
+                done = checkpoint.load_chunk(index) if resumed else None
+                if done is not None:
+                    future = Future()
+                    future.set_result(done)
+                    reused += 1
+                elif batched:
+                    future = batcher.submit(chunk, word_timestamps)
+                else:
+                    future = pool.submit(_transcribe_chunk, chunk, word_timestamps)
+                    if checkpointed:
+                        # Saved as soon as it finishes, not when its turn to be stitched comes
+                        future.add_done_callback(functools.partial(_save_chunk, checkpoint, index))
+                futures.append(future)
+
+            kept = []
+            try:
+                # Chunks finish in any order but are stitched and streamed in order
+                for offset, future in zip(offsets, futures):
+                    segments = [_to_timeline(seg, offset, regions, section_start) for seg in _result(future, conn)]
+                    for seg in stitch(kept, segments) if overlap else segments:
+                        conn.send({"segment": seg["text"]})
+                        kept.append(seg)
+            finally:
+                for future in futures:
+                    future.cancel()
+                if not batched and not all(future.done() for future in futures):
+                    # Abandoned with chunks still decoding: free the cores (and
+                    # long_jobs) now, not when every running chunk is done.
+                    # Batched windows are 30 s at most and are left to finish
+                    self._recycle((engine, model, compute_type), pool)
+
+        if checkpointed:
+            checkpoint.remove()
+        elapsed = time.monotonic() - downloaded
+        rtf = elapsed / duration if duration else 0.0
+        logging.info(
+            f"Transcribed {duration:.0f}s ({speech:.0f}s of speech) in {len(bounds)} chunks "
+            f"({reused} from checkpoint), {elapsed:.0f}s (RTF {rtf:.2f})"
+        )
+        result = {
+            "text": " ".join(seg["text"] for seg in kept),
+            "duration": round(duration, 3),
+            "speech_duration": round(speech, 3),
+            "chunks": len(bounds),
+            "batched": batched,
+            "resumed_chunks": reused,
+            "rtf": round(rtf, 3),
+            "engine": engine,
+            "model": model,
+            "compute_type": compute_type,
+            "timings": {"audio download": downloaded - started, "whisper": elapsed},
+            # [start, end, text] on the original timeline, to the 10 ms
+            "segments": [[round(seg["start"], 2), round(seg["end"], 2), seg["text"]] for seg in kept],
+        }
+        if word_timestamps:
+            result["words"] = [
+                [round(start, 2), round(end, 2), word] for seg in kept for start, end, word in seg["words"]
+            ]
+        conn.send(result)
+
+
+_start_lock = threading.Lock()
+
+
+def _connect():
+    try:
+        return Client(SERVER_ADDRESS, authkey=AUTHKEY)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+
+
+def connect():
+    """Connect to the Whisper server, starting it if nothing is listening."""
+    conn = _connect()
+    if conn:
+        return conn
+
+    with _start_lock:
+        conn = _connect()
+        if conn:
+            return conn
+
+        logging.info("Starting Whisper server...")
+        process = subprocess.Popen(
+            [WHISPER_PYTHON, os.path.abspath(__file__)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            conn = _connect()
+            if conn:
+                return conn
+            if process.poll() is not None:
+                # Lost the race to another process's server, or failed to start
+                conn = _connect()
+                if conn:
+                    return conn
+                raise RuntimeError(f"Whisper server exited with code {process.returncode}")
+            time.sleep(0.5)
+        raise RuntimeError("Whisper server did not start in time")
+
+
+def transcribe(source, model=None, on_segment=None, timeout=None, download_timeout=None,
+               engine=None, compute_type=None, word_timestamps=False, start=None, end=None):
+    """Transcribe ``source`` on the warm server.
+
+    ``source`` is a media URL, which the server downloads and decodes itself,
+    or a local audio file. Returns a dict with the full ``text``, the audio
+    ``duration``, the number of ``chunks``, the real-time factor ``rtf``
+    (decode time / audio time), per-stage ``timings``, the ``engine``,
+    ``model`` and ``compute_type`` that ran, and ``segments`` as
+    ``[start, end, text]`` triples. With ``word_timestamps`` it also holds
+    ``words``, ``[start, end, word]`` triples for every word. ``start`` and
+    ``end`` (seconds) transcribe only that section; timestamps stay on the
+    full recording's timeline.
+
+    If the server or one of its workers dies, the job is resubmitted and
+    resumes from its checkpoint. Raises ``subprocess.TimeoutExpired`` after
+    ``timeout`` seconds, which also makes the server abandon the job. ``download_timeout`` caps the download.
+    ``engine`` and ``compute_type`` pick the ASR backend (see ``engines``);
+    an unsupported combination raises ``ValueError`` before connecting.
+    """
+    engine, compute_type = engines.resolve(engine, compute_type)
+    if "://" in source:
+        request = {"url": source, "download_timeout": download_timeout}
+    else:
+        request = {"audio": os.path.abspath(source)}
+    request.update(
+        model=model, engine=engine, compute_type=compute_type, word_timestamps=word_timestamps, start=start, end=end,
+    )
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    relayed = 0
+    for attempt in range(RESUME_ATTEMPTS + 1):
+        # A rerun resumes from the server's checkpoint and replays the
+        # segments from the start; skip the ones already relayed
+        skip = relayed
+        conn = connect()
+        try:
+            conn.send(request)
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and (remaining <= 0 or not conn.poll(remaining)):
+                    raise subprocess.TimeoutExpired("whisper", timeout)
+                message = conn.recv()
+                if "segment" in message:
+                    if skip:
+                        skip -= 1
+                        continue
+                    relayed += 1
+                    if on_segment:
+                        on_segment(message["segment"])
+                elif "error" in message:
+                    if message.get("resumable") and attempt < RESUME_ATTEMPTS:
+                        logging.warning(f"{message['error']}, resuming")
+                        break
+                    raise RuntimeError(message["error"])
+                else:
+                    return message
+        except (EOFError, ConnectionResetError, BrokenPipeError):
+            if attempt == RESUME_ATTEMPTS:
+                raise RuntimeError("Whisper server died during transcription")
+            logging.warning("Whisper server died during transcription, resuming")
+        finally:
+            conn.close()
+
+
+def choose_model(duration=None, budget=None, quality=None, engine=None):
+    """Pick a model for ``duration`` seconds of audio.
+
+    ``quality`` caps the model size: ``fast`` is the smallest auto model,
+    ``balanced`` the deployment default and ``accurate`` the largest. With
+    no hint, a time ``budget`` allows up to the largest and no budget means
+    the default. Within the cap, the largest model expected to finish in
+    ``budget`` seconds wins, or the smallest if none does. An unknown
+    duration falls back to the default.
+    """
+    if quality == "fast":
+        return AUTO_MODELS[0]
+    if quality == "balanced":
+        cap = DEFAULT_MODEL
+    elif quality == "accurate" or budget is not None:
+        cap = AUTO_MODELS[-1]
+    else:
+        return DEFAULT_MODEL
+
+    candidates = AUTO_MODELS[:AUTO_MODELS.index(cap) + 1] if cap in AUTO_MODELS else [cap]
+    if budget is None:
+        return candidates[-1]
+    if duration is None:
+        # No estimate possible; don't gamble the deadline on a large model
+        return DEFAULT_MODEL if DEFAULT_MODEL in candidates else candidates[0]
+
+    speed = engines.ENGINES[engines.resolve(engine)[0]].relative_rtf
+    for model in reversed(candidates):
+        if duration * MODEL_RTF.get(model, 1.0) * speed <= budget * BUDGET_SHARE:
+            return model
+    return candidates[0]
+
+
+def _configure_logging():
+    logging.basicConfig(
+        filename=os.path.join(BASE_DIR, "transcript_debug.log"),
+        filemode='a',
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)s] whisper_server: %(message)s'
+    )
+
+
+if __name__ == "__main__":
+    _configure_logging()
+    WhisperServer().serve_forever()